@@ -0,0 +1,444 @@
+"""Headless HTTP API for the interview transcript analyzer.
+
+Usage:
+    python api_server.py --host 127.0.0.1 --port 8765
+
+One process serves every client: the model clients, rate limiter, disk cache,
+job queue workers and results store are the same process-wide objects the
+Streamlit app and batch runner use. Analyses run as background jobs (bounded
+by ANALYSIS_JOB_WORKERS); HTTP handling is bounded separately.
+
+Endpoints (JSON unless noted):
+    POST /analyses                  submit one transcript; returns 202 with the job ID
+    POST /analyses/batch            submit several transcripts against one job description
+    GET  /analyses/<job_id>         job status, and the rating, decision and report when done
+    GET  /analyses?ids=<id>,<id>    status of several jobs
+    GET  /analyses/<job_id>/stream  the report as it is generated (text/event-stream)
+    GET  /analyses/<job_id>/report?format=docx|pdf|md   the finished report as a file
+    GET  /health                    liveness and queue depth
+    GET  /metrics                   Prometheus text metrics
+
+Transcripts and job descriptions are sent either as text ("transcript",
+"job_description") or as files ("transcript_file", "job_description_file":
+{"name": "cv.pdf", "content_base64": "..."}) in .txt, .pdf or .docx format.
+Set API_TOKEN to require an "Authorization: Bearer <token>" header.
+"""
+import argparse
+import base64
+import binascii
+import hmac
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import app
+import job_queue
+import metrics
+import text_extraction
+
+# Request limits: body size, requests handled at once (streams counted separately), candidates per batch
+MAX_BODY_BYTES = int(float(os.getenv("API_MAX_BODY_MB", "25")) * 1024 * 1024)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "16"))
+MAX_STREAMS = int(os.getenv("API_MAX_STREAMS", "32"))
+MAX_BATCH_SIZE = int(os.getenv("API_MAX_BATCH_SIZE", "100"))
+# Submissions are refused with 503 while this many jobs are already waiting
+MAX_QUEUED_JOBS = int(os.getenv("API_MAX_QUEUED_JOBS", "1000"))
+# Seconds a client may take to send its request before the connection is dropped
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("API_REQUEST_TIMEOUT_SECONDS", "30"))
+# How often a stream checks its job for new output
+STREAM_POLL_SECONDS = 0.25
+API_TOKEN = os.getenv("API_TOKEN")
+
+FILE_TYPES = {
+    '.txt': 'text/plain',
+    '.md': 'text/plain',
+    '.pdf': text_extraction.PDF_MIME_TYPE,
+    '.docx': text_extraction.DOCX_MIME_TYPE,
+}
+REPORT_TYPES = {
+    "docx": text_extraction.DOCX_MIME_TYPE,
+    "pdf": text_extraction.PDF_MIME_TYPE,
+    "md": "text/markdown; charset=utf-8",
+}
+OUTPUT_MODES = (None, "markdown", "json")
+
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+class APIError(Exception):
+    """An error reported to the client as {"error": message} with the given HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class BytesUpload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile, so uploads go through app.read_file_content."""
+
+    def __init__(self, data, name, file_type):
+        super().__init__(data)
+        self.name = name
+        self.type = file_type
+
+
+def read_text_field(body, field):
+    """Return the text of body[field], or of the file in body[field + "_file"], extracting PDF/DOCX text."""
+    text = body.get(field)
+    if text is not None:
+        if not isinstance(text, str):
+            raise APIError(400, f"'{field}' must be a string.")
+        return text.strip()
+    upload = body.get(f"{field}_file")
+    if upload is None:
+        raise APIError(400, f"Provide '{field}' or '{field}_file'.")
+    if not isinstance(upload, dict) or not isinstance(upload.get("content_base64"), str):
+        raise APIError(400, f"'{field}_file' must be an object with 'name' and 'content_base64'.")
+    name = str(upload.get("name") or f"{field}.txt")
+    file_type = FILE_TYPES.get(os.path.splitext(name)[1].lower())
+    if file_type is None:
+        raise APIError(415, f"Unsupported file type for '{name}'. Use one of: {', '.join(sorted(FILE_TYPES))}.")
+    try:
+        data = base64.b64decode(upload["content_base64"], validate=True)
+    except (binascii.Error, ValueError):
+        raise APIError(400, f"'{field}_file' content is not valid base64.")
+    with metrics.stage("extract transcript" if field == "transcript" else "extract job description"):
+        text = app.read_file_content(BytesUpload(data, name, file_type))
+    if not text:
+        raise APIError(422, f"Could not read any text from '{name}'.")
+    return text.strip()
+
+
+def submission_options(body):
+    output_mode = body.get("output_mode")
+    if output_mode not in OUTPUT_MODES:
+        raise APIError(400, "'output_mode' must be \"markdown\" or \"json\".")
+    use_cache = body.get("use_cache", True)
+    # bool("false") is True, so only real JSON booleans are accepted
+    if not isinstance(use_cache, bool):
+        raise APIError(400, "'use_cache' must be true or false.")
+    return {"use_cache": use_cache, "output_mode": output_mode}
+
+
+def optional_string(body, field):
+    """Return body[field] if it is a string or absent; anything else is rejected."""
+    value = body.get(field)
+    if value is not None and not isinstance(value, str):
+        raise APIError(400, f"'{field}' must be a string.")
+    return value
+
+
+def check_capacity(new_jobs):
+    """Refuse submissions that would push the queue past MAX_QUEUED_JOBS."""
+    queued = app.get_job_queue().counts().get(job_queue.QUEUED, 0)
+    if queued + new_jobs > MAX_QUEUED_JOBS:
+        raise APIError(503, f"{queued} analyses are already queued; try again later.")
+
+
+def submit_one(body):
+    job_description = read_text_field(body, "job_description")
+    transcript = read_text_field(body, "transcript")
+    if not transcript or not job_description:
+        raise APIError(422, "Transcript and job description must not be empty.")
+    file_name = optional_string(body, "file_name")
+    requisition = optional_string(body, "requisition")
+    check_capacity(1)
+    file_name = file_name or (body.get("transcript_file") or {}).get("name")
+    job_id = app.submit_analysis_job(transcript, job_description, file_name=file_name,
+                                     requisition=requisition, **submission_options(body))
+    return job_links(job_id, file_name)
+
+
+def submit_batch(body):
+    candidates = body.get("candidates")
+    if not isinstance(candidates, list) or not candidates:
+        raise APIError(400, "'candidates' must be a non-empty list.")
+    if len(candidates) > MAX_BATCH_SIZE:
+        raise APIError(413, f"At most {MAX_BATCH_SIZE} candidates per batch.")
+    job_description = read_text_field(body, "job_description")
+    options = submission_options(body)
+    requisition = optional_string(body, "requisition")
+    # Read everything first so one bad file rejects the batch before any job is queued
+    transcripts = []
+    for index, candidate in enumerate(candidates):
+        if not isinstance(candidate, dict):
+            raise APIError(400, f"Candidate {index} must be an object.")
+        try:
+            transcript = read_text_field(candidate, "transcript")
+            file_name = optional_string(candidate, "file_name")
+        except APIError as e:
+            raise APIError(e.status, f"Candidate {index}: {e}")
+        if not transcript:
+            raise APIError(422, f"Candidate {index}: transcript is empty.")
+        transcripts.append((transcript, file_name or (candidate.get("transcript_file") or {}).get("name")))
+    check_capacity(len(transcripts))
+    requisition = requisition or app.default_requisition(job_description)
+    jobs = [job_links(app.submit_analysis_job(transcript, job_description, file_name=file_name,
+                                              requisition=requisition, **options), file_name)
+            for transcript, file_name in transcripts]
+    return {"requisition": requisition, "jobs": jobs}
+
+
+def job_links(job_id, file_name=None):
+    return {"job_id": job_id, "file_name": file_name, "status_url": f"/analyses/{job_id}",
+            "stream_url": f"/analyses/{job_id}/stream", "report_url": f"/analyses/{job_id}/report"}
+
+
+def job_summary(job, include_report=True):
+    """Return the client-facing view of a job: status, and the parsed verdict once it is done."""
+    summary = {key: job[key] for key in ("id", "status", "status_message", "error", "created_at", "started_at",
+                                         "finished_at", "queue_position")}
+    result = job["result"]
+    if job["status"] == job_queue.DONE and result:
+        parsed = result["parsed"]
+        summary.update({
+            "overall_rating": parsed["overall_rating"],
+            "decision": app.extract_decision_level(result["analysis"], app.get_decision_levels(), parsed)["level"],
+            "confidence": parsed["confidence"],
+            "candidate_name": app.extract_overview_field(parsed, "Candidate Name"),
+            "result_id": result.get("result_id"),
+            "cached": result.get("cached", False),
+            "bias_review": result.get("review", {}).get("ran", False),
+            "reused_sections": result.get("reused_sections", []),
+            "routing": result.get("routing"),
+        })
+        if include_report:
+            summary.update(analysis=result["analysis"], parsed=parsed)
+    return summary
+
+
+def get_job(job_id):
+    job = app.get_job_queue().get(job_id)
+    if job is None:
+        raise APIError(404, f"Analysis job {job_id} not found.")
+    return job
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TranscriptAnalyzerAPI/1.0"
+    timeout = REQUEST_TIMEOUT_SECONDS
+
+    ROUTES = [
+        ("GET", re.compile(r"^/health$"), "health"),
+        ("GET", re.compile(r"^/metrics$"), "prometheus_metrics"),
+        ("POST", re.compile(r"^/analyses$"), "create_analysis"),
+        ("POST", re.compile(r"^/analyses/batch$"), "create_batch"),
+        ("GET", re.compile(r"^/analyses$"), "list_analyses"),
+        ("GET", re.compile(r"^/analyses/(?P<job_id>[0-9a-f]{32})$"), "get_analysis"),
+        ("GET", re.compile(r"^/analyses/(?P<job_id>[0-9a-f]{32})/stream$"), "stream_analysis"),
+        ("GET", re.compile(r"^/analyses/(?P<job_id>[0-9a-f]{32})/report$"), "get_report"),
+    ]
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        self.query = parse_qs(url.query)
+        matches = [(route_method, pattern.match(url.path), handler) for route_method, pattern, handler in self.ROUTES]
+        matches = [(route_method, match, handler) for route_method, match, handler in matches if match]
+        try:
+            if not matches:
+                raise APIError(404, f"No endpoint at {url.path}.")
+            route = next(((match, handler) for route_method, match, handler in matches if route_method == method), None)
+            if route is None:
+                raise APIError(405, f"{method} is not allowed on {url.path}.")
+            if API_TOKEN and not hmac.compare_digest(self.headers.get("Authorization", "").encode('utf-8'),
+                                                  f"Bearer {API_TOKEN}".encode('utf-8')):
+                raise APIError(401, "Missing or invalid API token.")
+            match, handler = route
+            # Streams are long-lived, so they have their own, separate limit
+            slots = _stream_slots if handler == "stream_analysis" else _request_slots
+            if not slots.acquire(blocking=False):
+                raise APIError(503, "Server busy; try again shortly.")
+            try:
+                getattr(self, handler)(**match.groupdict())
+            finally:
+                slots.release()
+        except APIError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self.log_error("Unhandled error on %s: %r", self.path, e)
+            self._send_json(500, {"error": "Internal server error."})
+
+    def _read_json(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise APIError(411, "Content-Length is required.")
+        try:
+            length = int(length)
+        except ValueError:
+            raise APIError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_BYTES:
+            # Don't read the body; close the connection instead
+            self.close_connection = True
+            raise APIError(413, f"Request body exceeds {MAX_BODY_BYTES // (1024 * 1024)} MB.")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise APIError(400, "Request body must be JSON.")
+        if not isinstance(body, dict):
+            raise APIError(400, "Request body must be a JSON object.")
+        return body
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, default=str).encode('utf-8')
+        self._send_bytes(status, data, "application/json")
+
+    def _send_bytes(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def health(self):
+        self._send_json(200, {"status": "ok", "workers": app.JOB_WORKERS, "jobs": app.get_job_queue().counts(),
+                              "model_backend": app.MODEL_BACKEND, "routing": app.MODEL_ROUTING})
+
+    def prometheus_metrics(self):
+        self._send_bytes(200, metrics.prometheus_text().encode('utf-8'), "text/plain; version=0.0.4")
+
+    def create_analysis(self):
+        with metrics.run("api submit"):
+            self._send_json(202, submit_one(self._read_json()))
+
+    def create_batch(self):
+        with metrics.run("api submit"):
+            self._send_json(202, submit_batch(self._read_json()))
+
+    def list_analyses(self):
+        ids = [job_id for value in self.query.get("ids", []) for job_id in value.split(',') if job_id]
+        if not ids:
+            raise APIError(400, "Pass the job IDs as ?ids=<id>,<id>.")
+        if len(ids) > MAX_BATCH_SIZE:
+            raise APIError(413, f"At most {MAX_BATCH_SIZE} job IDs per request.")
+        queue = app.get_job_queue()
+        jobs = [queue.get(job_id) for job_id in ids]
+        self._send_json(200, {"jobs": [job_summary(job, include_report=False) if job else {"id": job_id, "status": "not found"}
+                                       for job_id, job in zip(ids, jobs)]})
+
+    def get_analysis(self, job_id):
+        self._send_json(200, job_summary(get_job(job_id)))
+
+    def get_report(self, job_id):
+        report_format = self.query.get("format", ["docx"])[0]
+        if report_format not in REPORT_TYPES:
+            raise APIError(400, f"'format' must be one of: {', '.join(REPORT_TYPES)}.")
+        job = get_job(job_id)
+        if job["status"] != job_queue.DONE:
+            raise APIError(409, f"Analysis is {job['status']}; the report is available once it is done.")
+        result = job["result"]
+        data = app.export_report(result["analysis"], report_format, result["parsed"])
+        headers = {"Content-Disposition": f'attachment; filename="interview_analysis_{job_id[:8]}.{report_format}"'}
+        missing = app.pdf_missing_characters(result["analysis"]) if report_format == "pdf" else []
+        if missing:
+            headers["X-Report-Warning"] = (f"{len(missing)} distinct character(s) cannot be shown in the PDF "
+                                           f"and appear as '?'; use format=docx or md for the full text.")
+        self._send_bytes(200, data, REPORT_TYPES[report_format], headers)
+
+    def stream_analysis(self, job_id):
+        """Send the report as server-sent events: "chunk" (new text), "reset" (discard the text so far,
+        e.g. after an escalation to the stronger model), "status", then one "done" or "failed" event.
+        A server error once the stream has started ends it with an "error" event."""
+        queue = app.get_job_queue()
+        job = get_job(job_id)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        # No Content-Length: the stream ends when the connection closes
+        self.close_connection = True
+        try:
+            self._stream_events(queue, job_id, job)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            # The 200 and event-stream headers are already sent, so a JSON error response would corrupt the stream
+            self.log_error("Unhandled error streaming %s: %r", job_id, e)
+            self._send_event("error", {"error": "Internal server error."})
+
+    def _stream_events(self, queue, job_id, job):
+        sent, message = "", ""
+        while True:
+            done = job["status"] == job_queue.DONE
+            text = job["result"]["analysis"] if done else job["progress_text"]
+            if not text.startswith(sent):
+                self._send_event("reset", None)
+                sent = ""
+            if len(text) > len(sent):
+                self._send_event("chunk", text[len(sent):])
+                sent = text
+            if job["status_message"] and job["status_message"] != message:
+                message = job["status_message"]
+                self._send_event("status", message)
+            if done:
+                self._send_event("done", job_summary(job, include_report=False))
+                return
+            if job["status"] == job_queue.FAILED:
+                self._send_event("failed", {"error": job["error"]})
+                return
+            time.sleep(STREAM_POLL_SECONDS)
+            job = queue.get(job_id)
+
+    def _send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+def warm_up():
+    """Create the shared resources before the first request instead of during it."""
+    started = time.perf_counter()
+    if app.MODEL_BACKEND == "gemini":
+        if not os.getenv("GOOGLE_API_KEY"):
+            sys.exit("Google API key not found. Set GOOGLE_API_KEY or ANALYSIS_MODEL_BACKEND=fake.")
+        app._configure_client(os.getenv("GOOGLE_API_KEY"))
+    app.get_job_queue()
+    app.get_results_store()
+    return time.perf_counter() - started
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the transcript analyzer as a local HTTP API.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"), help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8765")), help="Port to listen on.")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.quiet:
+        AnalysisRequestHandler.log_message = lambda self, *log_args: None
+    seconds = warm_up()
+    server = ThreadingHTTPServer((args.host, args.port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    print(f"Transcript analyzer API on http://{args.host}:{server.server_port} "
+          f"({app.JOB_WORKERS} analysis workers, {app.MODEL_BACKEND} backend, ready in {seconds:.2f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,68 +1,842 @@
+import time
+_import_started = time.perf_counter()
 import streamlit as st
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import io
-import base64
-from docx import Document
+import csv
+import importlib
+import collections
 import re
+import json
+import hashlib
+import math
+import datetime
+import threading
+import asyncio
+import contextlib
+import textwrap
+import unicodedata
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import text_extraction
+import transcript_compaction
+import metrics
+import model_router
+import resilient_client
+import job_queue
+import results_store
+import app_state
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Model and prompt identifiers; bump PROMPT_VERSION whenever the prompt templates change
+MODEL_NAME = 'gemini-2.5-flash'
+PROMPT_VERSION = "2"
+# Bump when text_extraction output changes so cached extractions are not reused
+EXTRACTION_VERSION = "1"
+
+# Result cache settings
+CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", ".analysis_cache")
+CACHE_MAX_BYTES = int(float(os.getenv("ANALYSIS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+CACHE_MAX_AGE_SECONDS = int(float(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "30")) * 86400)
+CACHE_DISABLED = os.getenv("ANALYSIS_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+# Writes keep a running size total; the directory is only scanned (in the background) when the total
+# passes the limit or this long after the last scan, to expire old entries and correct the total
+CACHE_SCAN_INTERVAL_SECONDS = 600
+# Eviction frees space down to this fraction of the limit so the next few writes do not trigger it again
+CACHE_EVICT_TARGET = 0.9
+
+_cache_lock = app_state.cache_lock
+_cache_stats = app_state.cache_stats
+
+# Process-wide resources shared by every Streamlit session: heavy modules, the configured client, models.
+# They live in app_state because Streamlit re-executes this script, resetting its globals, on every rerun.
+STARTUP_TIMINGS = app_state.startup_timings
+_lazy_modules = app_state.lazy_modules
+_models = app_state.models
+_resource_lock = app_state.resource_lock
+_rerun_timings = app_state.rerun_timings
+
+# Long transcript handling: transcripts estimated above the budget are summarized chunk by chunk first
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "30000"))
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "8000"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+
+# Timestamps, fillers, boilerplate and repeated speaker labels stripped before prompting:
+# "all", "none" or a comma list of transcript_compaction.COMPACTION_STEPS
+COMPACTION_STEPS = transcript_compaction.parse_steps(os.getenv("TRANSCRIPT_COMPACTION", "all"))
+
+# Job descriptions above this size are condensed into a requirements profile once and reused
+JD_PROFILE_MIN_TOKENS = int(os.getenv("JD_PROFILE_MIN_TOKENS", "400"))
+_jd_profiles = app_state.jd_profiles
+# Concurrent builds of the same profile share one model call; different JDs build in parallel
+_jd_profile_flight = app_state.jd_profile_flight
+
+# Background analysis jobs; the worker count bounds how many analyses run at once
+JOB_DB_PATH = os.getenv("ANALYSIS_JOB_DB", "analysis_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+
+# Finished analyses are kept here for ranking candidates across a requisition
+RESULTS_DB_PATH = os.getenv("ANALYSIS_RESULTS_DB", "analysis_results.sqlite3")
+
+# Explicit Gemini context caching of the shared prompt prefix (off by default; needs a large enough prefix)
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+CONTEXT_CACHE_TTL_MINUTES = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_MINUTES", "60"))
+_context_caches = app_state.context_caches
+_context_cache_lock = app_state.context_cache_lock
+
+# "markdown" for free-text reports, "json" for schema-validated structured output
+ANALYSIS_OUTPUT_MODE = os.getenv("ANALYSIS_OUTPUT_MODE", "markdown").lower()
+
+# Reuse cached report sections whose inputs did not change and generate only the others
+INCREMENTAL_ANALYSIS = os.getenv("INCREMENTAL_ANALYSIS", "1").lower() in ("1", "true", "yes")
+
+# "auto" runs the LLM bias review only when the local consistency check flags the analysis;
+# "always" and "never" force it on or off
+BIAS_REVIEW_MODE = os.getenv("BIAS_REVIEW_MODE", "auto").lower()
+_review_stats = app_state.review_stats
+_review_stats_lock = app_state.review_stats_lock
+
+# Decision levels allowed for each whole-number rating, per the rating guidelines in the prompt
+RATING_DECISIONS = {
+    5: {"SELECT"},
+    4: {"SELECT"},
+    3: {"HOLD"},
+    2: {"HOLD", "REJECT"},
+    1: {"REJECT"},
+}
+
+# Import a heavy module on first use and record how long it took
+def lazy_import(module_name):
+    """Return the module, importing it (and timing the import) only the first time it is needed."""
+    module = _lazy_modules.get(module_name)
+    if module is None:
+        with _resource_lock:
+            module = _lazy_modules.get(module_name)
+            if module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(module_name)
+                STARTUP_TIMINGS[f"import {module_name}"] = time.perf_counter() - started
+                _lazy_modules[module_name] = module
+    return module
+
+def _genai():
+    return lazy_import("google.generativeai")
+
+def _is_gemini_model(model):
+    # Checked by module name so local stand-in models never trigger the SDK import
+    while isinstance(model, resilient_client.ResilientModel):
+        model = model.wrapped
+    return type(model).__module__.startswith("google.generativeai")
+
+def _configure_client(api_key):
+    """Configure the Gemini client once per process; every session shares its connection pool."""
+    with _resource_lock:
+        if app_state.gemini_configured:
+            return
+        genai = _genai()
+        started = time.perf_counter()
+        genai.configure(api_key=api_key, transport=os.getenv("GEMINI_TRANSPORT") or None)
+        STARTUP_TIMINGS["configure client"] = time.perf_counter() - started
+        app_state.gemini_configured = True
+
 # Configure Google Gemini API
 def configure_gemini_api():
     """Configure the Google Gemini API with the API key from .env."""
+    if app_state.gemini_configured:
+        return
     try:
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             st.error("Google API key not found in .env file.")
             st.stop()
         
-        genai.configure(api_key=api_key)
+        _configure_client(api_key)
     except Exception as e:
         st.error(f"Error configuring API: {str(e)}")
         st.stop()
 
+# Get the shared model object for a model name
+def get_model(model_name=MODEL_NAME):
+    """Return the process-wide GenerativeModel for model_name, creating it on first use."""
+    model = _models.get(model_name)
+    if model is None:
+        with _resource_lock:
+            model = _models.get(model_name)
+            if model is None:
+                if not app_state.gemini_configured:
+                    _configure_client(os.getenv("GOOGLE_API_KEY"))
+                model = _genai().GenerativeModel(model_name)
+                _models[model_name] = model
+    return model
+
+# Model backends. A backend is a factory returning a model object with the same surface as
+# google.generativeai.GenerativeModel that this app uses:
+#   generate_content(contents, stream=False, generation_config=None) -> response (or iterator of chunks when streaming)
+#   generate_content_async(contents, generation_config=None) -> awaitable response
+#   model_name attribute, and optionally count_tokens(contents).total_tokens
+# Responses only need a .text attribute.
+MODEL_BACKEND = os.getenv("ANALYSIS_MODEL_BACKEND", "gemini").lower()
+_model_backends = {}
+
+# Requests per minute allowed per backend, shared by every session and worker; 0 disables the limit
+MODEL_RATE_LIMITS = {
+    "gemini": float(os.getenv("MODEL_RPM", "60")),
+    "fake": float(os.getenv("FAKE_MODEL_RPM", "0")),
+}
+
+# Tiered routing (MODEL_ROUTING=1): the fast model analyzes every transcript first and the strong
+# model redoes only uncertain results (low confidence, a 2-3 rating, or no rating/decision found)
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "").lower() in ("1", "true", "yes")
+FAST_MODEL_NAME = os.getenv("FAST_MODEL_NAME", "gemini-2.5-flash-lite")
+STRONG_MODEL_NAME = os.getenv("STRONG_MODEL_NAME", MODEL_NAME)
+ESCALATION_RATING_RANGE = (2, 3)
+# Stand-in tiers for the fake backend; the fast one answers FAKE_FAST_MODEL_SPEEDUP times quicker
+FAKE_MODEL_TIERS = ("fake-fast", "fake-strong")
+FAKE_FAST_MODEL_SPEEDUP = float(os.getenv("FAKE_FAST_MODEL_SPEEDUP", "3"))
+
+def register_model_backend(name, factory):
+    """Register factory(model_name, **options) under name for get_model_backend()."""
+    _model_backends[name] = factory
+
+def get_model_backend(name=None, model_name=MODEL_NAME, resilient=True, **options):
+    """Return a model from the named backend (default ANALYSIS_MODEL_BACKEND).
+
+    Unless resilient=False, the model is wrapped with the backend's shared rate limiter,
+    retries, circuit breaker and request coalescing (see resilient_client).
+    """
+    name = name or MODEL_BACKEND
+    if name not in _model_backends:
+        raise ValueError(f"Unknown model backend '{name}'. Available: {', '.join(sorted(_model_backends))}.")
+    model = _model_backends[name](model_name, **options)
+    return _make_resilient(name, model) if resilient else model
+
+# Get a fast/strong model pair for tiered routing
+def get_tiered_model(backend=None, fast_model_name=None, strong_model_name=None, **options):
+    """Return a model_router.TieredModel of two models from the backend (default ANALYSIS_MODEL_BACKEND)."""
+    backend = backend or MODEL_BACKEND
+    default_fast, default_strong = FAKE_MODEL_TIERS if backend == "fake" else (FAST_MODEL_NAME, STRONG_MODEL_NAME)
+    return model_router.TieredModel(get_model_backend(backend, fast_model_name or default_fast, **options),
+                                    get_model_backend(backend, strong_model_name or default_strong, **options))
+
+def _make_resilient(backend, model):
+    return resilient_client.ResilientModel(
+        model, limiter=get_rate_limiter(backend),
+        breaker=resilient_client.get_breaker(f"{backend}:{getattr(model, 'model_name', MODEL_NAME)}"))
+
+# Get the process-wide rate limiter of a backend
+def get_rate_limiter(backend=None):
+    """Return the token bucket shared by every model of the backend; use set_rate() to resize it."""
+    backend = backend or MODEL_BACKEND
+    return resilient_client.get_limiter(backend, MODEL_RATE_LIMITS.get(backend, 0))
+
+def _gemini_backend(model_name, **options):
+    return get_model(model_name)
+
+def _fake_backend(model_name, **options):
+    """Local deterministic model; FAKE_MODEL_LATENCY, FAKE_MODEL_ANALYSIS_CHARS and FAKE_MODEL_ERROR_RATE configure it."""
+    fake_model = lazy_import("fake_model")
+    options.setdefault("latency", float(os.getenv("FAKE_MODEL_LATENCY", "0")))
+    options.setdefault("analysis_chars", int(os.getenv("FAKE_MODEL_ANALYSIS_CHARS", "0")))
+    options.setdefault("error_rate", float(os.getenv("FAKE_MODEL_ERROR_RATE", "0")))
+    if model_name in FAKE_MODEL_TIERS:
+        options["model_name"] = model_name
+        if model_name == FAKE_MODEL_TIERS[0]:
+            options["latency"] /= FAKE_FAST_MODEL_SPEEDUP
+    return fake_model.FakeGenerativeModel(**options)
+
+register_model_backend("gemini", _gemini_backend)
+register_model_backend("fake", _fake_backend)
+
+# Startup and per-rerun overhead measurements
+def record_rerun_timing(seconds):
+    _rerun_timings.append(seconds)
+
+def get_startup_timings():
+    """Return import/configuration timings and rerun overhead statistics, in seconds."""
+    timings = dict(STARTUP_TIMINGS)
+    reruns = sorted(_rerun_timings)
+    if reruns:
+        timings["rerun overhead (last)"] = _rerun_timings[-1]
+        timings["rerun overhead (median)"] = reruns[len(reruns) // 2]
+        timings["rerun overhead (max)"] = reruns[-1]
+    return timings
+
+# Build a content-addressed cache key from text or bytes parts
+def make_cache_key(*parts):
+    """Hash the given parts into a stable hex digest usable as a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+def _cache_path(namespace, key):
+    return os.path.join(CACHE_DIR, namespace, key[:2], f"{key}.json")
+
+def _count_cache_event(namespace, event):
+    with _cache_lock:
+        stats = _cache_stats.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+        stats[event] += 1
+    metrics.count(f"{namespace} cache {event}")
+
+# Look up a cached value on disk
+def cache_get(namespace, key):
+    """Return the cached value for key, or None on a miss or expired entry."""
+    path = _cache_path(namespace, key)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_MAX_AGE_SECONDS:
+            os.remove(path)
+            _count_cache_event(namespace, "evictions")
+            _count_cache_event(namespace, "misses")
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path, None)
+    except (OSError, ValueError):
+        _count_cache_event(namespace, "misses")
+        return None
+    _count_cache_event(namespace, "hits")
+    return value
+
+# Store a value in the disk cache and evict old entries if needed
+def cache_put(namespace, key, value):
+    """Atomically write a JSON-serializable value to the cache."""
+    path = _cache_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced_size = os.path.getsize(path)
+        except OSError:
+            replaced_size = 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+    except (OSError, TypeError, ValueError):
+        return
+    _count_cache_event(namespace, "writes")
+    _track_cache_size(size - replaced_size)
+
+def _track_cache_size(delta):
+    """Add a write to the running size total and start a background eviction if one is due."""
+    with _cache_lock:
+        if app_state.cache_size_bytes is not None:
+            app_state.cache_size_bytes += delta
+        due = (app_state.cache_size_bytes is None or app_state.cache_size_bytes > CACHE_MAX_BYTES
+               or time.time() - app_state.cache_scanned_at > CACHE_SCAN_INTERVAL_SECONDS)
+        if not due or app_state.cache_evicting:
+            return
+        app_state.cache_evicting = True
+    threading.Thread(target=_evict_cache, name="analysis-cache-eviction", daemon=True).start()
+
+def _evict_cache():
+    """Drop expired entries, then least recently used ones until under the size target."""
+    try:
+        total_size = _scan_and_evict_cache()
+        with _cache_lock:
+            app_state.cache_size_bytes = total_size
+            app_state.cache_scanned_at = time.time()
+    finally:
+        with _cache_lock:
+            app_state.cache_evicting = False
+
+def _scan_and_evict_cache():
+    """Walk the cache directory, evict, and return the size of what is left."""
+    entries = []
+    now = time.time()
+    for root, _dirs, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+
+    total_size = sum(size for _, size, _ in entries)
+    target_size = CACHE_MAX_BYTES * CACHE_EVICT_TARGET if total_size > CACHE_MAX_BYTES else CACHE_MAX_BYTES
+    entries.sort()
+    for mtime, size, path in entries:
+        if now - mtime <= CACHE_MAX_AGE_SECONDS and total_size <= target_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+        namespace = os.path.relpath(path, CACHE_DIR).split(os.sep)[0]
+        _count_cache_event(namespace, "evictions")
+    return total_size
+
+# Report cache hit/miss counters
+def get_cache_stats():
+    """Return a snapshot of the per-namespace cache counters."""
+    with _cache_lock:
+        return {namespace: dict(stats) for namespace, stats in _cache_stats.items()}
+
 # Function to read different file types
 def read_file_content(uploaded_file):
-    """Read content from different file types."""
+    """Read content from different file types.
+
+    Extracted text is cached by a hash of the file bytes, so re-uploading the same
+    file (e.g. one job description for many candidates) skips extraction entirely.
+    """
     try:
-        if uploaded_file.type == 'application/pdf':
-            try:
-                import PyPDF2
-            except ImportError:
-                st.error("PyPDF2 is required to read PDF files.")
-                return None
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            content = ' '.join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        elif uploaded_file.type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            doc = Document(uploaded_file)
-            content = ' '.join([para.text for para in doc.paragraphs])
-        elif uploaded_file.type == 'text/plain':
-            content = uploaded_file.getvalue().decode('utf-8')
-        else:
-            st.warning(f"Unsupported file type: {uploaded_file.type}. Attempting to read as text.")
-            try:
-                content = uploaded_file.getvalue().decode('utf-8')
-            except Exception:
-                st.error(f"Could not read file '{uploaded_file.name}' as text.")
-                return None
+        data = uploaded_file.getvalue()
+        file_type = uploaded_file.type
+        if file_type not in (text_extraction.PDF_MIME_TYPE, text_extraction.DOCX_MIME_TYPE, 'text/plain'):
+            st.warning(f"Unsupported file type: {file_type}. Attempting to read as text.")
+
+        cache_key = make_cache_key("extract", EXTRACTION_VERSION, file_type, data)
+        content = cache_get("extract", cache_key)
+        if content is not None:
+            return content
+
+        try:
+            content = text_extraction.extract_text(data, file_type)
+        except ImportError:
+            st.error("PyPDF2 is required to read PDF files.")
+            return None
+        except UnicodeDecodeError:
+            st.error(f"Could not read file '{uploaded_file.name}' as text.")
+            return None
+
+        if content:
+            cache_put("extract", cache_key, content)
         return content
     except Exception as e:
         st.error(f"Error reading file '{uploaded_file.name}': {str(e)}")
         return None
 
-# Function to generate comprehensive interview analysis
-def generate_interview_analysis(transcript_text, job_description, decision_levels):
-    """Generate a structured analysis of the interview transcript using Gemini."""
+# Rough token estimate used for budgeting (about 4 characters per token)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Count prompt tokens, asking the model only when the estimate is close to the budget
+def count_tokens(text, model=None, budget=TRANSCRIPT_TOKEN_BUDGET):
+    """Return the token count of text, falling back to the local estimate."""
+    estimate = estimate_tokens(text)
+    if model is None or not hasattr(model, 'count_tokens') or not 0.75 * budget < estimate < 1.5 * budget:
+        return estimate
     try:
-        # Update to use the recommended model
-        model = genai.GenerativeModel('gemini-2.5-flash')
-    except Exception as e:
-        st.error(f"Error creating Generative Model: {str(e)}.")
-        return {"analysis": "Could not configure the AI model."}
-    
+        return model.count_tokens(text).total_tokens
+    except Exception:
+        return estimate
+
+SPEAKER_TURN_PATTERN = re.compile(
+    r"(?:^|(?<=\s))(?:\[?\d{1,2}:\d{2}(?::\d{2})?\]?\s*)?[A-Z][\w'().-]*(?: [A-Z][\w'().-]*){0,3}:\s", re.MULTILINE
+)
+
+# Split a transcript into speaker turns
+def split_transcript_turns(transcript_text):
+    """Split on speaker labels (e.g. "Interviewer:") or, failing that, on blank lines and sentences."""
+    starts = [match.start() for match in SPEAKER_TURN_PATTERN.finditer(transcript_text)]
+    if len(starts) > 1:
+        bounds = [0] + starts + [len(transcript_text)]
+        turns = [transcript_text[begin:end].strip() for begin, end in zip(bounds, bounds[1:])]
+    else:
+        turns = re.split(r'\n\s*\n|(?<=[.!?])\s+', transcript_text)
+    return [turn.strip() for turn in turns if turn.strip()]
+
+# Pack speaker turns into chunks that fit the per-chunk token budget
+def chunk_transcript(transcript_text, chunk_tokens=CHUNK_TOKEN_BUDGET):
+    """Return a list of transcript chunks, each ending on a speaker-turn boundary."""
+    max_chars = chunk_tokens * 4
+    chunks, current, current_len = [], [], 0
+    for turn in split_transcript_turns(transcript_text):
+        # A single monologue longer than a chunk is cut into pieces
+        pieces = [turn[i:i + max_chars] for i in range(0, len(turn), max_chars)]
+        for piece in pieces:
+            if current and current_len + len(piece) > max_chars:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+# Build the prompt summarizing one chunk of a long transcript
+def build_chunk_prompt(chunk_text, index, total):
+    return f"""You are condensing part {index} of {total} of a long interview transcript so it can be evaluated later.
+Extract, as concise Markdown bullet points:
+
+*   **Participants:** names and roles of speakers, interview date/time or type if mentioned.
+*   **Questions and Answers:** each question the interviewer asked (verbatim or close to it) and a faithful summary of the candidate's answer, including its depth and any mistakes.
+*   **Skills Evidence:** technologies, skills, years of experience and accomplishments the candidate mentioned or demonstrated.
+*   **Communication Notes:** clarity, confidence and professionalism observations.
+*   **Interview Flow:** how the interviewer structured this part.
+
+Do not evaluate or rate the candidate. Do not invent content that is not in the transcript.
+
+Transcript part {index} of {total}:
+---
+{chunk_text}
+---
+"""
+
+def _join_chunk_notes(notes):
+    parts = [f"### Transcript Part {i} of {len(notes)}\n{note.strip()}" for i, note in enumerate(notes, 1)]
+    return ("[Condensed notes from a long interview transcript, summarized part by part. "
+            "Treat them as the transcript.]\n\n" + "\n\n".join(parts))
+
+def _summarize_chunk(model, chunk_text, index, total):
+    cache_key = make_cache_key("chunk", PROMPT_VERSION, model_cache_name(model), index, total, chunk_text)
+    cached = cache_get("chunk", cache_key)
+    if cached is not None:
+        return cached
+    note = _response_text(_generate(model, "chunk summary", build_chunk_prompt(chunk_text, index, total)))
+    if note:
+        cache_put("chunk", cache_key, note)
+    return note
+
+async def _summarize_chunk_async(model, chunk_text, index, total):
+    cache_key = make_cache_key("chunk", PROMPT_VERSION, model_cache_name(model), index, total, chunk_text)
+    cached = cache_get("chunk", cache_key)
+    if cached is not None:
+        return cached
+    note = _response_text(await _generate_async(model, "chunk summary", build_chunk_prompt(chunk_text, index, total)))
+    if note:
+        cache_put("chunk", cache_key, note)
+    return note
+
+# Strip prompt tokens that carry no interview content (timestamps, fillers, boilerplate)
+def compact_transcript_for_prompt(transcript_text):
+    """Return (compacted_text, stats); stats adds estimated tokens before and after."""
+    with metrics.stage("compact transcript"):
+        compacted, stats = transcript_compaction.compact_transcript(transcript_text, COMPACTION_STEPS)
+    stats["tokens_before"] = estimate_tokens(transcript_text)
+    stats["tokens_after"] = estimate_tokens(compacted)
+    metrics.count("compaction tokens saved", stats["tokens_before"] - stats["tokens_after"])
+    return compacted, stats
+
+# Map-reduce step for transcripts that do not fit the token budget
+def condense_transcript(transcript_text, model):
+    """Return the transcript unchanged if it fits the budget, otherwise condensed chunk notes.
+
+    Chunks are summarized in parallel; if the joined notes are still over budget
+    they are condensed again, so very long interviews shrink level by level.
+    """
+    tokens = count_tokens(transcript_text, model)
+    if tokens <= TRANSCRIPT_TOKEN_BUDGET:
+        return transcript_text
+    with metrics.stage("condense transcript"):
+        while tokens > TRANSCRIPT_TOKEN_BUDGET:
+            chunks = chunk_transcript(transcript_text)
+            with ThreadPoolExecutor(max_workers=CHUNK_WORKERS) as executor:
+                # Each task gets its own copy of the context so its stages land in the caller's run
+                futures = [executor.submit(contextvars.copy_context().run, _summarize_chunk, model, chunk, i, len(chunks))
+                           for i, chunk in enumerate(chunks, 1)]
+                notes = [future.result() for future in futures]
+            transcript_text = _join_chunk_notes(notes)
+            tokens, previous = count_tokens(transcript_text, model), tokens
+            if tokens >= previous:
+                # Summaries are not getting shorter; analyze what we have rather than loop
+                break
+    return transcript_text
+
+# Async variant of condense_transcript
+async def condense_transcript_async(transcript_text, model):
+    tokens = count_tokens(transcript_text, model)
+    if tokens <= TRANSCRIPT_TOKEN_BUDGET:
+        return transcript_text
+    with metrics.stage("condense transcript"):
+        while tokens > TRANSCRIPT_TOKEN_BUDGET:
+            chunks = chunk_transcript(transcript_text)
+            slots = asyncio.Semaphore(CHUNK_WORKERS)
+
+            async def summarize(chunk, index):
+                async with slots:
+                    return await _summarize_chunk_async(model, chunk, index, len(chunks))
+
+            notes = await asyncio.gather(*(summarize(chunk, i) for i, chunk in enumerate(chunks, 1)))
+            transcript_text = _join_chunk_notes(notes)
+            tokens, previous = count_tokens(transcript_text, model), tokens
+            if tokens >= previous:
+                break
+    return transcript_text
+
+# Build the prompt that condenses a job description into a requirements profile
+def build_jd_profile_prompt(job_description):
+    return f"""Condense the following job description into a compact, structured requirements profile that will be used to evaluate interview transcripts.
+Use these Markdown headings with short bullet points, and keep every concrete requirement (skills, technologies, years of experience, certifications, education):
+
+*   **Role:** title, seniority, team/domain.
+*   **Must-Have Requirements:** essential skills and experience.
+*   **Nice-to-Have Requirements:** preferred but optional qualifications.
+*   **Key Responsibilities:** the main duties of the role.
+*   **Soft Skills:** communication, leadership and collaboration expectations.
+
+Omit company marketing, benefits, salary and application instructions. Do not add requirements that are not in the text.
+
+Job Description:
+---
+{job_description}
+---
+"""
+
+# Get the reusable requirements profile for a job description
+def get_jd_profile(job_description, model):
+    """Return the compact requirements profile for a job description, building it once per JD.
+
+    Profiles are kept in memory and in the disk cache under the JD's hash. Short job
+    descriptions, and any profile that fails to generate, fall back to the full text.
+    """
+    if estimate_tokens(job_description) < JD_PROFILE_MIN_TOKENS:
+        return job_description
+
+    cache_key = make_cache_key("jd_profile", PROMPT_VERSION, model_cache_name(model), job_description)
+    profile = _jd_profiles.get(cache_key)
+    if profile is None:
+        profile = _jd_profile_flight.do(cache_key, lambda: _build_jd_profile(job_description, model, cache_key))
+    return profile or job_description
+
+def _build_jd_profile(job_description, model, cache_key):
+    """Load or generate the profile for cache_key; returns "" if it could not be generated."""
+    profile = cache_get("jd_profile", cache_key)
+    if profile is None:
+        try:
+            profile = _response_text(_generate(model, "jd profile", build_jd_profile_prompt(job_description))).strip()
+        except Exception:
+            profile = ""
+        if not profile:
+            return ""
+        cache_put("jd_profile", cache_key, profile)
+    _jd_profiles[cache_key] = profile
+    return profile
+
+def _context_cached_model(model, prefix):
+    """Return a model bound to a Gemini cached context holding prefix, or None if not applicable."""
+    if not CONTEXT_CACHE_ENABLED or not _is_gemini_model(model) \
+            or estimate_tokens(prefix) < CONTEXT_CACHE_MIN_TOKENS:
+        return None
+
+    key = make_cache_key("context", model.model_name, prefix)
+    with _context_cache_lock:
+        cached_model, expires_at = _context_caches.get(key, (None, 0))
+        if expires_at > time.time():
+            return cached_model
+        try:
+            genai = _genai()
+            cached_content = lazy_import("google.generativeai.caching").CachedContent.create(
+                model=model.model_name, contents=[prefix],
+                ttl=datetime.timedelta(minutes=CONTEXT_CACHE_TTL_MINUTES))
+            cached_model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            # Renew a minute early so a request never lands on an expired cache
+            expires_at = time.time() + CONTEXT_CACHE_TTL_MINUTES * 60 - 60
+        except Exception:
+            # Provider refused (e.g. prefix below its minimum size); don't retry for a while
+            cached_model, expires_at = None, time.time() + 300
+        _context_caches[key] = (cached_model, expires_at)
+    return cached_model
+
+# Pick the model, contents and call options for the main analysis call
+def _analysis_request(model, transcript_text, job_profile, decision_levels, output_mode="markdown",
+                      reused_sections=None):
+    """Return (model, contents, options), sending only the transcript when the prefix is context-cached.
+
+    With reused_sections ({number: section}) the model is asked for the remaining sections only.
+    """
+    prefix = build_analysis_prefix(job_profile, decision_levels)
+    if reused_sections:
+        suffix = build_partial_analysis_suffix(transcript_text, reused_sections)
+    else:
+        suffix = build_analysis_suffix(transcript_text, output_mode)
+    options = {}
+    if output_mode == "json":
+        options["generation_config"] = {
+            "response_mime_type": "application/json",
+            "response_schema": analysis_json_schema(decision_levels),
+        }
+    cached_model = _context_cached_model(model, prefix)
+    if cached_model is not None:
+        return _make_resilient("gemini", cached_model), suffix, options
+    return model, prefix + suffix, options
+
+# Run the main analysis call and decode its output
+def _generate_analysis_text(model, transcript_text, job_profile, decision_levels, output_mode):
+    """Return (analysis_text, parsed); invalid JSON output falls back to one Markdown-mode call."""
+    analysis_model, contents, options = _analysis_request(model, transcript_text, job_profile, decision_levels, output_mode)
+    text = _response_text(_generate(analysis_model, "main generation", contents, **options),
+                          "Error: Could not parse AI response.")
+    if output_mode != "json":
+        return text, None
+    parsed = decode_analysis_json(text, decision_levels)
+    if parsed is not None:
+        return render_analysis_markdown(parsed), parsed
+    metrics.count("retries")
+    return _generate_analysis_text(model, transcript_text, job_profile, decision_levels, "markdown")
+
+async def _generate_analysis_text_async(model, transcript_text, job_profile, decision_levels, output_mode):
+    analysis_model, contents, options = await asyncio.to_thread(
+        _analysis_request, model, transcript_text, job_profile, decision_levels, output_mode)
+    response = await _generate_async(analysis_model, "main generation", contents, **options)
+    text = _response_text(response, "Error: Could not parse AI response.")
+    if output_mode != "json":
+        return text, None
+    parsed = decode_analysis_json(text, decision_levels)
+    if parsed is not None:
+        return render_analysis_markdown(parsed), parsed
+    metrics.count("retries")
+    return await _generate_analysis_text_async(model, transcript_text, job_profile, decision_levels, "markdown")
+
+# Decide whether the fast model's analysis should be redone by the strong model
+def escalation_reasons(analysis_text, parsed, decision_levels):
+    """Return why a first-pass analysis is too uncertain to keep; empty if it can be kept."""
+    if not analysis_text or analysis_text.startswith("Error:"):
+        return ["First pass failed"]
+    parsed = parsed or parse_analysis(analysis_text, decision_levels)
+    reasons = []
+    rating = extract_overall_rating(analysis_text, parsed)["Overall Rating"]
+    if not rating:
+        reasons.append("Rating not extracted")
+    elif ESCALATION_RATING_RANGE[0] <= rating <= ESCALATION_RATING_RANGE[1]:
+        reasons.append("Boundary rating")
+    # extract_decision_level falls back to a level derived from the rating, so look for an explicit one
+    if parsed["decision"] not in decision_levels:
+        reasons.append("Decision not extracted")
+    if parsed["confidence"] == "Low":
+        reasons.append("Low confidence")
+    return reasons
+
+# Run a generation step on the fast tier, then on the strong tier if the result is uncertain
+def _route(model, generate, decision_levels):
+    """Return generate(tier_model) -> (analysis_text, parsed), escalating when model is a TieredModel.
+
+    An analysis_text of None means the step could not produce a result; it is passed back without routing.
+    """
+    if not isinstance(model, model_router.TieredModel):
+        return generate(model)
+    try:
+        analysis_text, parsed = generate(model.fast)
+    except Exception:
+        # An open circuit or API error on the fast tier is one more reason to ask the strong one
+        reasons = ["Fast model error"]
+    else:
+        if analysis_text is None:
+            return None, None
+        reasons = escalation_reasons(analysis_text, parsed, decision_levels)
+    model_router.record_decision(model, reasons)
+    if reasons:
+        analysis_text, parsed = generate(model.strong)
+    return analysis_text, parsed
+
+async def _route_async(model, generate, decision_levels):
+    if not isinstance(model, model_router.TieredModel):
+        return await generate(model)
+    try:
+        analysis_text, parsed = await generate(model.fast)
+    except Exception:
+        reasons = ["Fast model error"]
+    else:
+        if analysis_text is None:
+            return None, None
+        reasons = escalation_reasons(analysis_text, parsed, decision_levels)
+    model_router.record_decision(model, reasons)
+    if reasons:
+        analysis_text, parsed = await generate(model.strong)
+    return analysis_text, parsed
+
+# JSON schema for the structured output mode
+def analysis_json_schema(decision_levels):
+    return {
+        "type": "object",
+        "properties": {
+            "sections": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "number": {"type": "integer"},
+                        "title": {"type": "string"},
+                        "content": {"type": "string"},
+                    },
+                    "required": ["number", "title", "content"],
+                },
+            },
+            "overall_rating": {"type": "number"},
+            "decision": {"type": "string", "enum": list(decision_levels.keys())},
+            "confidence": {"type": "string", "enum": ["Low", "Medium", "High"]},
+            "questions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {"type": "string"},
+                        "answer": {"type": "string"},
+                        "quality": {"type": "string"},
+                    },
+                    "required": ["question", "answer", "quality"],
+                },
+            },
+        },
+        "required": ["sections", "overall_rating", "decision", "confidence", "questions"],
+    }
+
+# Validate a JSON-mode response and convert it to the parsed analysis structure
+def decode_analysis_json(text, decision_levels):
+    """Return the parsed analysis for a schema-conforming JSON response, or None if it is invalid."""
+    try:
+        data = json.loads(text)
+        sections = sorted(
+            ({"number": int(section["number"]), "title": str(section["title"]).strip(),
+              "content": str(section["content"]).strip()} for section in data["sections"]),
+            key=lambda section: section["number"])
+        rating = float(data["overall_rating"])
+        decision = str(data["decision"]).upper()
+        confidence = str(data["confidence"]).capitalize()
+        questions = [{"question": str(q["question"]), "answer": str(q.get("answer", "")),
+                      "quality": str(q.get("quality", ""))} for q in data["questions"]]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+    if [section["number"] for section in sections] != list(SECTION_TITLES) or not 1 <= rating <= 5 \
+            or decision not in decision_levels or confidence not in ("Low", "Medium", "High"):
+        return None
+    return {
+        "source": "json",
+        "preamble": "",
+        "sections": sections,
+        "overall_rating": rating,
+        "decision": decision,
+        "confidence": confidence,
+        "questions": questions,
+        "bias_check": None,
+    }
+
+# Render a parsed analysis back into the 8-section Markdown report
+def render_analysis_markdown(parsed):
+    """Return the Markdown report for a parsed analysis, making sure rating and decision lines are present."""
+    blocks = [parsed["preamble"]] if parsed["preamble"] else []
+    for section in parsed["sections"]:
+        content = section["content"]
+        if section["number"] == 7 and not RATING_PATTERN.search(content):
+            content = f"*   **Overall Rating (Score: {parsed['overall_rating']:g}/5)**\n{content}"
+        if section["number"] == 8:
+            if "recommendation:" not in content.lower():
+                content = f"*   **Recommendation:** {parsed['decision']}\n{content}"
+            if parsed["confidence"] and "confidence" not in content.lower():
+                content += f"\n*   **Confidence Level:** {parsed['confidence']}"
+        blocks.append(f"**{section['number']}. {section['title']}**\n{content}")
+    return "\n\n".join(blocks)
+
+# Build the candidate-independent part of the analysis prompt
+def build_analysis_prefix(job_description, decision_levels):
+    """Return the prompt prefix shared by every candidate for one job description.
+
+    It ends right where the transcript starts, so it can be reused as a cached context.
+    """
     job_context = f"""
 Job Description:
 ---
@@ -130,11 +904,6 @@ Please ensure a balanced assessment giving candidates fair consideration.
 
 {rating_guidelines}
 
-Transcript:
----
-{transcript_text}
----
-
 {job_context}
 
 **Instructions for AI:**
@@ -145,20 +914,49 @@ Transcript:
 *   Structure the output clearly using the headings provided above. Use Markdown for formatting.
 *   Ensure your final recommendation (SELECT/HOLD/REJECT) aligns with your overall rating.
 *   Do not be overly critical. Consider the candidate's potential to grow into the role.
+
+Transcript:
+---
 """
+    return prompt
 
-    try:
-        response = model.generate_content(prompt)
-        analysis_text = ""
-        if hasattr(response, 'text'):
-            analysis_text = response.text
-        elif hasattr(response, 'parts') and response.parts:
-            analysis_text = "".join(part.text for part in response.parts if hasattr(part, 'text'))
-        else:
-            analysis_text = "Error: Could not parse AI response."
-        
-        # Add a review step to check for bias
-        review_prompt = f"""
+# Build the candidate-specific part of the analysis prompt
+def build_analysis_suffix(transcript_text, output_mode="markdown"):
+    suffix = f"""{transcript_text}
+---
+"""
+    if output_mode == "json":
+        suffix += """
+Return the analysis as a JSON object matching the response schema instead of Markdown:
+*   "sections": all 8 sections above, each with its number, title and Markdown content.
+*   "overall_rating": the numeric rating from section 7 (1-5).
+*   "decision" and "confidence": the recommendation and confidence level from section 8.
+*   "questions": one entry per key question from section 3 with the candidate's answer and its quality.
+"""
+    return suffix
+
+# Build the transcript part of the prompt when some sections are reused from an earlier analysis
+def build_partial_analysis_suffix(transcript_text, reused_sections):
+    written = "\n\n".join(_section_markdown(number, reused_sections[number]) for number in sorted(reused_sections))
+    missing = [f"{number}. {title}" for number, title in SECTION_TITLES.items() if number not in reused_sections]
+    return build_analysis_suffix(transcript_text) + f"""
+The following sections of this analysis were already written from the same transcript and remain valid:
+
+{written}
+
+Write ONLY these sections, following the headings and instructions above and staying consistent with the sections already written: {'; '.join(missing)}.
+Do not repeat the sections already written.
+"""
+
+# Build the main analysis prompt
+def build_analysis_prompt(transcript_text, job_description, decision_levels):
+    """Return the prompt asking the model for the 8-section interview analysis."""
+    return build_analysis_prefix(job_description, decision_levels) + build_analysis_suffix(transcript_text)
+
+# Build the bias review prompt for a finished analysis
+def build_review_prompt(analysis_text):
+    """Return the prompt asking the model to double-check the decision for bias."""
+    return f"""
 Review the following interview analysis and check if the decision recommendation appears biased or unreasonably strict:
 
 Analysis:
@@ -174,75 +972,784 @@ Guidelines:
 
 Provide only a brief correction if needed, or confirm the original assessment if it seems fair.
 """
-        
-        try:
-            review_response = model.generate_content(review_prompt)
-            review_text = ""
-            if hasattr(review_response, 'text'):
-                review_text = review_response.text
-            elif hasattr(review_response, 'parts') and review_response.parts:
-                review_text = "".join(part.text for part in review_response.parts if hasattr(part, 'text'))
-            
-            # Only include the review if it suggests a correction
-            if "correction" in review_text.lower() or "reassess" in review_text.lower() or "reconsider" in review_text.lower():
-                analysis_text += "\n\n## Bias Check\n" + review_text
-        except Exception:
-            # If review fails, continue with original analysis
-            pass
-             
-        return {
-            "analysis": analysis_text
-        }
+
+# Call the model inside a metrics stage and record the response's token usage
+def _generate(model, stage_name, contents, **options):
+    if isinstance(model, model_router.TieredModel):
+        # Auxiliary calls (chunk notes, JD profile, bias review) run on the fast tier
+        model = model.fast
+    with metrics.stage(stage_name) as stage:
+        response = model.generate_content(contents, **options)
+        stage.record_usage(response, getattr(model, 'model_name', None))
+    return response
+
+async def _generate_async(model, stage_name, contents, **options):
+    if isinstance(model, model_router.TieredModel):
+        model = model.fast
+    with metrics.stage(stage_name) as stage:
+        response = await model.generate_content_async(contents, **options)
+        stage.record_usage(response, getattr(model, 'model_name', None))
+    return response
+
+def _response_text(response, default=""):
+    """Pull the generated text out of a Gemini response."""
+    if hasattr(response, 'text'):
+        return response.text
+    if hasattr(response, 'parts') and response.parts:
+        return "".join(part.text for part in response.parts if hasattr(part, 'text'))
+    return default
+
+def _apply_review(analysis_text, review_text):
+    """Append the bias review to the analysis, but only if it suggests a correction."""
+    if "correction" in review_text.lower() or "reassess" in review_text.lower() or "reconsider" in review_text.lower():
+        analysis_text += "\n\n## Bias Check\n" + review_text
+    return analysis_text
+
+# Deterministic cross-check of the rating, decision and confidence
+def check_analysis_consistency(parsed, decision_levels):
+    """Return a list of reasons the analysis needs a second look; empty if it is consistent.
+
+    A fractional rating (e.g. 3.5) accepts the decisions of both neighbouring whole ratings.
+    """
+    reasons = []
+    rating, decision = parsed["overall_rating"], parsed["decision"]
+    if rating and not 1 <= rating <= 5:
+        # e.g. a parsed structure cached before ratings were bounded; never index RATING_DECISIONS with it
+        rating = 0
+    if not rating:
+        reasons.append("Overall rating could not be extracted.")
+    if decision not in decision_levels:
+        reasons.append("Final decision could not be extracted.")
+    if rating and decision in decision_levels:
+        allowed = RATING_DECISIONS[int(math.floor(rating))] | RATING_DECISIONS[int(math.ceil(rating))]
+        if decision not in allowed:
+            reasons.append(f"Decision {decision} does not match rating {rating:g}/5 (expected {'/'.join(sorted(allowed))}).")
+    if parsed["confidence"] == "Low":
+        reasons.append("Model reported low confidence.")
+    elif parsed["confidence"] is None:
+        reasons.append("Confidence level could not be extracted.")
+    return reasons
+
+def _needs_review(analysis_text, parsed, decision_levels):
+    """Decide whether to spend the LLM bias review call; returns (run_review, reasons)."""
+    if BIAS_REVIEW_MODE == "never" or analysis_text.startswith("Error:"):
+        run_review, reasons = False, []
+    else:
+        reasons = check_analysis_consistency(parsed or parse_analysis(analysis_text, decision_levels), decision_levels)
+        run_review = BIAS_REVIEW_MODE == "always" or bool(reasons)
+    with _review_stats_lock:
+        _review_stats["run" if run_review else "skipped"] += 1
+    return run_review, reasons
+
+# Report how often the bias review call was skipped
+def get_review_stats():
+    """Return counts of bias reviews run and skipped, plus the skip rate."""
+    with _review_stats_lock:
+        stats = dict(_review_stats)
+    total = stats["run"] + stats["skipped"]
+    stats["skip_rate"] = stats["skipped"] / total if total else 0.0
+    return stats
+
+def _analysis_cache_key(transcript_text, job_description, decision_levels, model, output_mode):
+    return make_cache_key("analysis", PROMPT_VERSION, model_cache_name(model), output_mode,
+                          ','.join(decision_levels.keys()), ','.join(COMPACTION_STEPS), transcript_text, job_description)
+
+def _finish_analysis(cache_key, analysis_text, parsed, decision_levels, review=None, compaction=None,
+                     section_keys=None, reused_sections=()):
+    """Wrap the final analysis text and its parsed structure in a result dict and cache it.
+
+    With section_keys, each section is also cached for incremental re-analysis.
+    """
+    with metrics.stage("parse"):
+        if parsed is None:
+            parsed = parse_analysis(analysis_text, decision_levels)
+        else:
+            # Structured output: only the appended bias review still needs indexing
+            parsed = dict(parsed, bias_check=parse_analysis(analysis_text, decision_levels)["bias_check"])
+    result = {
+        "analysis": analysis_text,
+        "parsed": parsed,
+        "review": review or {"ran": False, "reasons": []},
+        "compaction": compaction,
+        "reused_sections": sorted(reused_sections),
+        # Set by model_router.record_decision when a tiered model analyzed this transcript
+        "routing": (metrics.current_run() or {}).get("routing")
+    }
+    if not CACHE_DISABLED and not analysis_text.startswith("Error:"):
+        cache_put("analysis", cache_key, result)
+        if section_keys is not None and INCREMENTAL_ANALYSIS:
+            _store_sections(section_keys, parsed)
+    result["cached"] = False
+    return result
+
+def _lookup_analysis(cache_key, use_cache):
+    if not use_cache or CACHE_DISABLED:
+        return None
+    with metrics.stage("cache lookup"):
+        cached = cache_get("analysis", cache_key)
+    if cached is not None:
+        cached["cached"] = True
+    return cached
+
+# Section cache keys: transcript-only sections on the transcript, the others also on the job description
+def _section_cache_keys(transcript_text, job_description, decision_levels, model, output_mode):
+    """Return (transcript_key, jd_key); the JD is whitespace-normalized so reformatting it reuses every section.
+
+    Returns None in JSON mode: reused sections are merged into a Markdown report, which would replace
+    the schema-validated structure (and its questions) with a heuristic parse.
+    """
+    if output_mode == "json":
+        return None
+    transcript_key = make_cache_key("sections", PROMPT_VERSION, model_cache_name(model), output_mode,
+                                    ','.join(COMPACTION_STEPS), ','.join(map(str, TRANSCRIPT_SECTIONS)),
+                                    transcript_text)
+    jd_key = make_cache_key(transcript_key, ','.join(decision_levels.keys()), ' '.join(job_description.split()))
+    return transcript_key, jd_key
+
+def _lookup_sections(section_keys, use_cache):
+    """Return {number: {"title", "content"}} for the cached sections whose inputs are unchanged."""
+    if not INCREMENTAL_ANALYSIS or not use_cache or CACHE_DISABLED or section_keys is None:
+        return {}
+    sections = {}
+    with metrics.stage("section lookup"):
+        for key in section_keys:
+            # JSON object keys are strings
+            sections.update((int(number), section) for number, section in (cache_get("sections", key) or {}).items())
+    return sections
+
+def _store_sections(section_keys, parsed):
+    """Cache the sections of a complete report under the inputs each one depends on."""
+    sections = {section["number"]: {"title": section["title"], "content": section["content"]}
+                for section in parsed["sections"]}
+    if sorted(sections) != list(SECTION_TITLES):
+        return
+    transcript_key, jd_key = section_keys
+    cache_put("sections", transcript_key,
+              {number: section for number, section in sections.items() if number in TRANSCRIPT_SECTIONS})
+    cache_put("sections", jd_key,
+              {number: section for number, section in sections.items() if number not in TRANSCRIPT_SECTIONS})
+
+def _section_markdown(number, section):
+    return f"**{number}. {section['title']}**\n{section['content']}"
+
+def _merge_sections(reused_sections, generated_text, decision_levels):
+    """Return the full report from reused and newly generated sections, or None if any section is missing."""
+    generated = {section["number"]: section for section in parse_analysis(generated_text, decision_levels)["sections"]}
+    sections = {**generated, **reused_sections}
+    if sorted(sections) != list(SECTION_TITLES):
+        return None
+    return "\n\n".join(_section_markdown(number, sections[number]) for number in SECTION_TITLES)
+
+# Regenerate only the sections whose inputs changed
+def _generate_missing_sections(model, transcript_text, job_profile, decision_levels, reused_sections):
+    """Return the merged report text, or None if the partial response is unusable (callers then run the full analysis)."""
+    metrics.count("sections reused", len(reused_sections))
+    analysis_model, contents, options = _analysis_request(model, transcript_text, job_profile, decision_levels,
+                                                          reused_sections=reused_sections)
+    text = _response_text(_generate(analysis_model, "partial generation", contents, **options))
+    return _merge_sections(reused_sections, text, decision_levels)
+
+async def _generate_missing_sections_async(model, transcript_text, job_profile, decision_levels, reused_sections):
+    metrics.count("sections reused", len(reused_sections))
+    analysis_model, contents, options = await asyncio.to_thread(
+        _analysis_request, model, transcript_text, job_profile, decision_levels, reused_sections=reused_sections)
+    text = _response_text(await _generate_async(analysis_model, "partial generation", contents, **options))
+    return _merge_sections(reused_sections, text, decision_levels)
+
+def _default_model_name():
+    # Matches model_router.TieredModel.model_name for the default tiers
+    return f"{FAST_MODEL_NAME}>{STRONG_MODEL_NAME}" if MODEL_ROUTING else MODEL_NAME
+
+# Model name used in cache keys
+def model_cache_name(model=None):
+    """Return the name cache keys use for model (None means the default model).
+
+    Gemini models report "models/gemini-2.5-flash" while MODEL_NAME is "gemini-2.5-flash";
+    the prefix is dropped so passed-in and default models share cache entries.
+    """
+    model_name = getattr(model, 'model_name', MODEL_NAME) if model is not None else _default_model_name()
+    return '>'.join(part.removeprefix("models/") for part in model_name.split('>'))
+
+def _default_model():
+    try:
+        if MODEL_ROUTING:
+            return get_tiered_model()
+        # Update to use the recommended model
+        return get_model_backend(model_name=MODEL_NAME)
     except Exception as e:
-        st.error(f"Error generating analysis: {str(e)}")
-        return {"analysis": f"Could not generate analysis. Error: {str(e)}"}
+        st.error(f"Error creating Generative Model: {str(e)}.")
+        return None
 
-# Function to create a downloadable Word document
-def create_word_doc(analysis_text):
-    """Create a Word document from the analysis text and return a download link."""
+# Function to generate comprehensive interview analysis
+def generate_interview_analysis(transcript_text, job_description, decision_levels, use_cache=True, model=None,
+                                output_mode=None):
+    """Generate a structured analysis of the interview transcript using Gemini.
+
+    With use_cache=False the cached result is ignored and replaced by the fresh one.
+    A preconfigured model (e.g. a rate-limited or local fake model) can be passed in.
+    output_mode ("markdown" or "json") defaults to ANALYSIS_OUTPUT_MODE. The result holds
+    the Markdown report under "analysis" and its parsed structure under "parsed".
+    When the transcript was analyzed before against another job description, the
+    transcript-only sections are reused and only the others are generated; their
+    numbers are listed under "reused_sections".
+    """
+    output_mode = output_mode or ANALYSIS_OUTPUT_MODE
+    with metrics.run("analysis", output_mode=output_mode):
+        cache_key = _analysis_cache_key(transcript_text, job_description, decision_levels, model, output_mode)
+        cached = _lookup_analysis(cache_key, use_cache)
+        if cached is not None:
+            return cached
+
+        model = model or _default_model()
+        if model is None:
+            return {"analysis": "Could not configure the AI model."}
+
+        try:
+            transcript_text, compaction = compact_transcript_for_prompt(transcript_text)
+            section_keys = _section_cache_keys(transcript_text, job_description, decision_levels, model, output_mode)
+            reused = _lookup_sections(section_keys, use_cache)
+            if sorted(reused) == list(SECTION_TITLES):
+                # Only the formatting of the inputs changed; no model call needed
+                analysis_text, parsed = _merge_sections(reused, "", decision_levels), None
+            else:
+                transcript_text = condense_transcript(transcript_text, model)
+                job_profile = get_jd_profile(job_description, model)
+                analysis_text = parsed = None
+                if reused:
+                    analysis_text, parsed = _route(model, lambda tier: (_generate_missing_sections(
+                        tier, transcript_text, job_profile, decision_levels, reused), None), decision_levels)
+                if analysis_text is None:
+                    reused = {}
+                    analysis_text, parsed = _route(model, lambda tier: _generate_analysis_text(
+                        tier, transcript_text, job_profile, decision_levels, output_mode), decision_levels)
+
+            # Add a review step to check for bias, only if the local consistency check flags the analysis
+            run_review, reasons = _needs_review(analysis_text, parsed, decision_levels)
+            if run_review:
+                try:
+                    review_response = _generate(model, "bias review", build_review_prompt(analysis_text))
+                    analysis_text = _apply_review(analysis_text, _response_text(review_response))
+                except Exception:
+                    # If review fails, continue with original analysis
+                    pass
+
+            return _finish_analysis(cache_key, analysis_text, parsed, decision_levels,
+                                    {"ran": run_review, "reasons": reasons}, compaction, section_keys, reused)
+        except Exception as e:
+            st.error(f"Error generating analysis: {str(e)}")
+            return {"analysis": f"Could not generate analysis. Error: {str(e)}"}
+
+# Async variant of generate_interview_analysis
+async def generate_interview_analysis_async(transcript_text, job_description, decision_levels, use_cache=True,
+                                            model=None, analysis_slots=None, review_slots=None, output_mode=None):
+    """Generate the same analysis as generate_interview_analysis using the async Gemini calls.
+
+    analysis_slots and review_slots are optional semaphores bounding the concurrent main
+    and review calls separately, so one candidate's review overlaps the next one's analysis.
+    """
+    output_mode = output_mode or ANALYSIS_OUTPUT_MODE
+    with metrics.run("analysis", output_mode=output_mode):
+        cache_key = _analysis_cache_key(transcript_text, job_description, decision_levels, model, output_mode)
+        cached = _lookup_analysis(cache_key, use_cache)
+        if cached is not None:
+            return cached
+
+        model = model or _default_model()
+        if model is None:
+            return {"analysis": "Could not configure the AI model."}
+
+        try:
+            transcript_text, compaction = compact_transcript_for_prompt(transcript_text)
+            section_keys = _section_cache_keys(transcript_text, job_description, decision_levels, model, output_mode)
+            reused = _lookup_sections(section_keys, use_cache)
+            if sorted(reused) == list(SECTION_TITLES):
+                analysis_text, parsed = _merge_sections(reused, "", decision_levels), None
+            else:
+                transcript_text = await condense_transcript_async(transcript_text, model)
+                # Built once per JD behind a lock, so run it off the event loop
+                job_profile = await asyncio.to_thread(get_jd_profile, job_description, model)
+                analysis_text = parsed = None
+                async with analysis_slots or contextlib.nullcontext():
+                    if reused:
+                        async def generate_missing(tier):
+                            return await _generate_missing_sections_async(
+                                tier, transcript_text, job_profile, decision_levels, reused), None
+
+                        analysis_text, parsed = await _route_async(model, generate_missing, decision_levels)
+                    if analysis_text is None:
+                        reused = {}
+                        analysis_text, parsed = await _route_async(model, lambda tier: _generate_analysis_text_async(
+                            tier, transcript_text, job_profile, decision_levels, output_mode), decision_levels)
+
+            run_review, reasons = _needs_review(analysis_text, parsed, decision_levels)
+            if run_review:
+                try:
+                    async with review_slots or contextlib.nullcontext():
+                        review_response = await _generate_async(model, "bias review", build_review_prompt(analysis_text))
+                    analysis_text = _apply_review(analysis_text, _response_text(review_response))
+                except Exception:
+                    pass
+
+            return _finish_analysis(cache_key, analysis_text, parsed, decision_levels,
+                                    {"ran": run_review, "reasons": reasons}, compaction, section_keys, reused)
+        except Exception as e:
+            return {"analysis": f"Could not generate analysis. Error: {str(e)}"}
+
+# Analyze many transcripts concurrently, pipelining main analyses and bias reviews
+async def analyze_candidates_async(transcripts, job_description, decision_levels, concurrency=4,
+                                   use_cache=True, model=None, on_result=None):
+    """Analyze a list of transcript texts against one job description; returns results in order.
+
+    on_result(index, result) is called as each candidate finishes.
+    """
+    analysis_slots = asyncio.Semaphore(concurrency)
+    review_slots = asyncio.Semaphore(concurrency)
+
+    async def run(index, transcript_text):
+        result = await generate_interview_analysis_async(transcript_text, job_description, decision_levels,
+                                                         use_cache=use_cache, model=model,
+                                                         analysis_slots=analysis_slots, review_slots=review_slots)
+        if on_result is not None:
+            on_result(index, result)
+        return result
+
+    return await asyncio.gather(*(run(i, text) for i, text in enumerate(transcripts)))
+
+# Streaming variant of generate_interview_analysis
+def stream_interview_analysis(transcript_text, job_description, decision_levels, use_cache=True, model=None,
+                              output_mode=None):
+    """Yield ("chunk", text) events as the analysis is generated, then one ("done", result) event.
+
+    Long transcripts emit a ("status", message) event before they are condensed, and
+    so does a partial re-analysis that reuses unchanged sections. With a routed
+    (tiered) model, an escalation emits ("reset", None), meaning the text streamed so
+    far is discarded, before the strong model's report streams. A cached result is emitted as a single chunk. The bias review, if it suggests a
+    correction, arrives as a final chunk after the main analysis. JSON output cannot be
+    rendered while incomplete, so in JSON mode the report arrives as one chunk.
+    """
+    output_mode = output_mode or ANALYSIS_OUTPUT_MODE
+    with metrics.run("analysis", output_mode=output_mode):
+        cache_key = _analysis_cache_key(transcript_text, job_description, decision_levels, model, output_mode)
+        cached = _lookup_analysis(cache_key, use_cache)
+        if cached is not None:
+            yield ("chunk", cached["analysis"])
+            yield ("done", cached)
+            return
+
+        model = model or _default_model()
+        if model is None:
+            yield ("done", {"analysis": "Could not configure the AI model."})
+            return
+
+        try:
+            transcript_text, compaction = compact_transcript_for_prompt(transcript_text)
+            section_keys = _section_cache_keys(transcript_text, job_description, decision_levels, model, output_mode)
+            reused = _lookup_sections(section_keys, use_cache)
+            analysis_text = parsed = None
+            if sorted(reused) == list(SECTION_TITLES):
+                analysis_text = _merge_sections(reused, "", decision_levels)
+                yield ("chunk", analysis_text)
+            else:
+                if count_tokens(transcript_text, model) > TRANSCRIPT_TOKEN_BUDGET:
+                    yield ("status", f"Long transcript: summarizing {len(chunk_transcript(transcript_text))} parts before analysis...")
+                    transcript_text = condense_transcript(transcript_text, model)
+                job_profile = get_jd_profile(job_description, model)
+                if reused:
+                    yield ("status", f"Reusing {len(reused)} unchanged sections; regenerating the rest...")
+                    analysis_text, parsed = _route(model, lambda tier: (_generate_missing_sections(
+                        tier, transcript_text, job_profile, decision_levels, reused), None), decision_levels)
+                    if analysis_text is not None:
+                        yield ("chunk", analysis_text)
+            if analysis_text is None:
+                reused = {}
+                # A routed model streams the fast tier's report, and the strong tier's if it is escalated
+                tiers = [model.fast, model.strong] if isinstance(model, model_router.TieredModel) else [model]
+                for tier in tiers:
+                    try:
+                        if output_mode == "json":
+                            analysis_text, parsed = _generate_analysis_text(tier, transcript_text, job_profile, decision_levels, output_mode)
+                            yield ("chunk", analysis_text)
+                        else:
+                            analysis_model, contents, options = _analysis_request(tier, transcript_text, job_profile, decision_levels)
+                            parts, last_chunk = [], None
+                            with metrics.stage("main generation") as stage:
+                                for chunk in analysis_model.generate_content(contents, stream=True, **options):
+                                    last_chunk = chunk
+                                    text = _response_text(chunk)
+                                    if text:
+                                        parts.append(text)
+                                        yield ("chunk", text)
+                                # Streamed responses report the usage of the whole call on the final chunk
+                                stage.record_usage(last_chunk, getattr(analysis_model, 'model_name', None))
+                            analysis_text, parsed = "".join(parts) or "Error: Could not parse AI response.", None
+                    except Exception:
+                        if tier is tiers[-1]:
+                            raise
+                        escalation = ["Fast model error"]
+                    else:
+                        if tier is tiers[-1]:
+                            break
+                        escalation = escalation_reasons(analysis_text, parsed, decision_levels)
+                    model_router.record_decision(model, escalation)
+                    if not escalation:
+                        break
+                    yield ("reset", None)
+                    yield ("status", f"First pass uncertain ({', '.join(escalation).lower()}); "
+                                     f"re-running with {model.strong.model_name}...")
+
+            reviewed_text = analysis_text
+            run_review, reasons = _needs_review(analysis_text, parsed, decision_levels)
+            if run_review:
+                yield ("status", "Reviewing the recommendation for consistency...")
+                try:
+                    review_response = _generate(model, "bias review", build_review_prompt(analysis_text))
+                    reviewed_text = _apply_review(analysis_text, _response_text(review_response))
+                except Exception:
+                    pass
+            if len(reviewed_text) > len(analysis_text):
+                yield ("chunk", reviewed_text[len(analysis_text):])
+
+            yield ("done", _finish_analysis(cache_key, reviewed_text, parsed, decision_levels,
+                                            {"ran": run_review, "reasons": reasons}, compaction, section_keys,
+                                            reused))
+        except Exception as e:
+            yield ("done", {"analysis": f"Could not generate analysis. Error: {str(e)}"})
+
+# Pick out the rating and decision from a partially streamed analysis
+def extract_live_indicators(analysis_text, decision_levels, state):
+    """Update state with "rating", "decision" and "section" as soon as they appear in the text.
+
+    Each indicator is only parsed once its section has been emitted, and is not
+    re-parsed after it has been found, so calling this per chunk stays cheap.
+    """
+    headings = re.findall(r'^\W*([1-8])\.\s+\**[A-Z]', analysis_text[state.get("scanned", 0):], re.MULTILINE)
+    if headings:
+        state["section"] = max(state.get("section", 0), *(int(number) for number in headings))
+    # Re-scan the last line next time in case a heading was split across chunks
+    state["scanned"] = max(0, analysis_text.rfind('\n'))
+
+    if not state.get("rating"):
+        start = analysis_text.find("Overall Rating")
+        if start != -1 and re.search(r'/\s*5', analysis_text[start:]):
+            rating = extract_overall_rating(analysis_text[start:]).get("Overall Rating", 0)
+            if rating:
+                state["rating"] = rating
+
+    if not state.get("decision"):
+        start = analysis_text.rfind("Final Decision Recommendation")
+        # Wait until the line after the recommendation has started so the level is complete
+        if start != -1 and re.search(r'Recommendation[^\n]*:[^\n]*\n', analysis_text[start + len("Final Decision Recommendation"):]):
+            state["decision"] = extract_decision_level(analysis_text, decision_levels)
+
+    return state
+
+# Run a coroutine on the process-wide background event loop
+def run_async(coro):
+    """Run coro on a long-lived event loop thread and wait for its result.
+
+    The async gRPC channel stays bound to one loop, so every Streamlit session and
+    batch run shares this loop instead of creating a new one with asyncio.run().
+    """
+    with app_state.async_loop_lock:
+        if app_state.async_loop is None:
+            app_state.async_loop = asyncio.new_event_loop()
+            threading.Thread(target=app_state.async_loop.run_forever, name="analysis-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, app_state.async_loop).result()
+
+# Get the process-wide job queue, starting its workers on first use
+def get_job_queue():
+    queue = job_queue.get_queue(JOB_DB_PATH)
+    queue.start_workers(_run_analysis_job, JOB_WORKERS)
+    return queue
+
+# Queue an analysis for the background workers
+def submit_analysis_job(transcript_text, job_description, use_cache=True, output_mode=None, file_name=None,
+                        requisition=None):
+    """Return the ID of a new analysis job; poll get_job_queue().get(job_id) for its progress and result.
+
+    The finished analysis is also saved to the results store under requisition.
+    """
+    return get_job_queue().submit({
+        "transcript": transcript_text,
+        "job_description": job_description,
+        "use_cache": use_cache,
+        "output_mode": output_mode,
+        "file_name": file_name,
+        "requisition": requisition,
+    })
+
+def _run_analysis_job(job_id, job, progress):
+    """Job handler: stream the analysis, saving the partial text so a polling UI can show it live."""
+    streamed_text, result = "", None
+    with metrics.run("analysis", job_id=job_id) as run_metrics:
+        for event, payload in stream_interview_analysis(job["transcript"], job["job_description"],
+                                                        get_decision_levels(), use_cache=job["use_cache"],
+                                                        output_mode=job["output_mode"]):
+            if event == "done":
+                result = payload
+                break
+            if event == "reset":
+                streamed_text = ""
+            elif event == "status":
+                progress(streamed_text, payload)
+            else:
+                streamed_text += payload
+                progress(streamed_text)
+    if "parsed" not in result:
+        raise RuntimeError(result["analysis"])
+    result["result_id"] = save_result(result, job["transcript"], job["job_description"],
+                                      file_name=job.get("file_name"), requisition=job.get("requisition"))
+    result["metrics"] = run_metrics
+    return result
+
+# Get the process-wide results store
+def get_results_store():
+    return results_store.get_store(RESULTS_DB_PATH)
+
+# Default requisition name for a job description: its first line
+def default_requisition(job_description):
+    first_line = next((line.strip(" #*\t") for line in job_description.splitlines() if line.strip(" #*\t")), "")
+    return first_line[:80] or "Untitled requisition"
+
+# Pull a field such as "Candidate Name" out of the Interview Overview section
+def extract_overview_field(parsed, label):
+    for section in parsed.get("sections", []):
+        if section["number"] == 1:
+            match = re.search(rf'{re.escape(label)}\W*:\**\s*(.+)', section["content"], re.IGNORECASE)
+            value = match.group(1).strip(" *_") if match else ""
+            if value and value.lower() not in ("not mentioned", "n/a", "unknown", "not specified"):
+                return value
+    return None
+
+# Store a finished analysis for the candidate ranking view
+def save_result(result, transcript_text, job_description, file_name=None, requisition=None):
+    """Save an analysis result to the results store; returns its row ID, or None if it was not saved."""
+    parsed = result.get("parsed")
+    if not parsed or result.get("analysis", "").startswith("Error:"):
+        return None
     try:
-        doc = Document()
-        doc.add_heading('Interview Analysis Report', 0)
-        lines = analysis_text.split('\n')
-        current_heading_level = 0
-        
-        for line in lines:
-            stripped_line = line.strip()
-            if not stripped_line:
-                continue
+        return get_results_store().save({
+            "requisition": requisition or default_requisition(job_description),
+            "jd_hash": make_cache_key(job_description),
+            "transcript_hash": make_cache_key(transcript_text),
+            "candidate_name": extract_overview_field(parsed, "Candidate Name"),
+            "file_name": file_name,
+            "overall_rating": parsed["overall_rating"],
+            # The level the report shows, including the rating fallback when no recommendation line was found
+            "decision": extract_decision_level(result["analysis"], get_decision_levels(), parsed)["level"],
+            "confidence": parsed["confidence"],
+            "bias_review": result.get("review", {}).get("ran"),
+            "analysis": result["analysis"],
+            "parsed": parsed,
+        })
+    except Exception:
+        # The analysis itself succeeded; failing to store it must not turn it into an error
+        return None
 
-            if stripped_line.startswith('**') and stripped_line.endswith('**'):
-                heading_text = stripped_line.strip('*').strip()
-                if re.match(r'^\d+\.\s+', heading_text):
-                    doc.add_heading(heading_text, level=1)
-                    current_heading_level = 1
-                elif heading_text in ["Overall Rating", "Justification", "Recommendation", "Supporting Points", "Confidence Level"]:
-                    doc.add_heading(heading_text, level=2)
-                    current_heading_level = 2
-                else:
-                    p = doc.add_paragraph()
-                    p.add_run(heading_text).bold = True
-                    current_heading_level = 0
-
-            elif re.match(r'^\d+\.\s+', stripped_line):
-                doc.add_heading(stripped_line, level=1)
-                current_heading_level = 1
-            
-            elif stripped_line.startswith(('* ', '- ', '+ ')):
-                text = stripped_line[2:]
-                doc.add_paragraph(text, style='List Bullet')
-                current_heading_level = 0
+REPORT_TITLE = 'Interview Analysis Report'
+REPORT_FORMATS = {
+    "docx": {"label": "Word Document (.docx)", "mime": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"},
+    "pdf": {"label": "PDF (.pdf)", "mime": "application/pdf"},
+    "md": {"label": "Markdown (.md)", "mime": "text/markdown"},
+}
+REPORT_CACHE_SIZE = 32
+_report_cache = app_state.report_cache
+_report_cache_lock = app_state.report_cache_lock
+
+# Turn a parsed analysis into format-neutral report blocks
+def _report_blocks(parsed):
+    """Return (kind, text) blocks: "title", "heading1", "heading2", "bold", "bullet" or "paragraph"."""
+    blocks = [("title", REPORT_TITLE)]
+    blocks += _markdown_blocks(parsed["preamble"])
+    for section in parsed["sections"]:
+        blocks.append(("heading1", f"{section['number']}. {section['title']}"))
+        blocks += _markdown_blocks(section["content"])
+    if parsed["bias_check"]:
+        blocks.append(("heading1", "Bias Check"))
+        blocks += _markdown_blocks(parsed["bias_check"])
+    return blocks
 
+def _markdown_blocks(text):
+    """Classify the lines of one section as sub-headings, bullets or paragraphs."""
+    blocks = []
+    for line in text.split('\n'):
+        stripped_line = line.strip()
+        if not stripped_line:
+            continue
+
+        if stripped_line.startswith('**') and stripped_line.endswith('**'):
+            heading_text = stripped_line.strip('*').strip()
+            if heading_text in ["Overall Rating", "Justification", "Recommendation", "Supporting Points", "Confidence Level"]:
+                blocks.append(("heading2", heading_text))
             else:
-                doc.add_paragraph(stripped_line)
-                current_heading_level = 0
+                blocks.append(("bold", heading_text))
 
-        doc_io = io.BytesIO()
-        doc.save(doc_io)
-        doc_io.seek(0)
-        b64_doc = base64.b64encode(doc_io.read()).decode('utf-8')
-        
-        return f'data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{b64_doc}'
+        elif stripped_line.startswith(('* ', '- ', '+ ')):
+            blocks.append(("bullet", stripped_line[2:].strip()))
+
+        else:
+            blocks.append(("paragraph", stripped_line.lstrip('#').strip()))
+    return blocks
+
+def _render_docx(blocks):
+    doc = lazy_import("docx").Document()
+    for kind, text in blocks:
+        if kind == "title":
+            doc.add_heading(text, 0)
+        elif kind == "heading1":
+            doc.add_heading(text, level=1)
+        elif kind == "heading2":
+            doc.add_heading(text, level=2)
+        elif kind == "bold":
+            doc.add_paragraph().add_run(text).bold = True
+        elif kind == "bullet":
+            doc.add_paragraph(text, style='List Bullet')
+        else:
+            doc.add_paragraph(text)
+    doc_io = io.BytesIO()
+    doc.save(doc_io)
+    return doc_io.getvalue()
+
+PDF_STYLES = {
+    # kind: (font, size, space before, indent)
+    "title": ("F2", 18, 0, 0),
+    "heading1": ("F2", 14, 14, 0),
+    "heading2": ("F2", 12, 8, 0),
+    "bold": ("F2", 11, 6, 0),
+    "bullet": ("F1", 11, 2, 14),
+    "paragraph": ("F1", 11, 4, 0),
+}
+# The PDF fonts use WinAnsiEncoding (cp1252), which has curly quotes, dashes, bullets and the
+# ellipsis; these common characters outside it get a close equivalent
+PDF_TEXT_REPLACEMENTS = str.maketrans({
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2015': '-', '\u2212': '-',
+    '\u2032': "'", '\u2033': '"', '\u2190': '<-', '\u2192': '->', '\u2194': '<->',
+    '\u2264': '<=', '\u2265': '>=', '\u2248': '~', '\u2260': '!=', '\u2713': '+', '\u2714': '+',
+    '\u2717': 'x', '\u2718': 'x', '\u25cf': '\u2022', '\u25e6': '-', '\u200b': '',
+    '\u0141': 'L', '\u0142': 'l', '\u0110': 'D', '\u0111': 'd', '\u0131': 'i',
+})
+PDF_MISSING_TEXT_NOTE = ("Note: {count} character(s) in this report ({sample}) cannot be shown with the PDF's "
+                         "built-in fonts and appear as '?'. The Word and Markdown reports contain the full text.")
+
+def _pdf_encode(text):
+    """Return (text, missing): text as cp1252 code points for the PDF fonts, and the characters replaced by '?'.
+
+    Accented letters outside cp1252 fall back to their base letter (e.g. "ő" -> "o").
+    """
+    encoded, missing = [], []
+    for char in text.translate(PDF_TEXT_REPLACEMENTS):
+        try:
+            encoded.append(char.encode('cp1252').decode('latin-1'))
+            continue
+        except UnicodeEncodeError:
+            pass
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        try:
+            encoded.append(base.encode('cp1252').decode('latin-1') if base else '?')
+            if not base:
+                missing.append(char)
+        except UnicodeEncodeError:
+            encoded.append('?')
+            missing.append(char)
+    return ''.join(encoded), missing
+
+# Characters of a report the PDF export cannot show
+def pdf_missing_characters(analysis_text):
+    """Return the distinct characters of analysis_text that the PDF export replaces with '?'."""
+    return sorted(set(_pdf_encode(analysis_text)[1]))
+
+def _render_pdf(blocks):
+    """Write a simple text PDF (Helvetica, wrapped and paginated) without extra dependencies."""
+    page_width, page_height, margin = 612, 792, 50
+    pages, lines = [], []
+    y = page_height - margin
+    encoded_blocks, missing = [], []
+    for kind, text in blocks:
+        text, block_missing = _pdf_encode(text.replace('**', '').replace('__', ''))
+        encoded_blocks.append((kind, text))
+        missing += block_missing
+    if missing:
+        # Say so in the document rather than leaving unexplained '?' marks
+        metrics.count("pdf characters replaced", len(missing))
+        sample = ', '.join(f"U+{ord(char):04X}" for char in list(dict.fromkeys(missing))[:5])
+        encoded_blocks.append(("paragraph", PDF_MISSING_TEXT_NOTE.format(count=len(missing), sample=sample)))
+    for kind, text in encoded_blocks:
+        font, size, space_before, indent = PDF_STYLES[kind]
+        if kind == "bullet":
+            text = "- " + text
+        # Helvetica averages about half an em per character
+        max_chars = max(20, int((page_width - 2 * margin - indent) / (size * 0.5)))
+        wrapped = textwrap.wrap(text, max_chars) or [""]
+        y -= space_before
+        for i, line in enumerate(wrapped):
+            if y - size < margin:
+                pages.append(lines)
+                lines, y = [], page_height - margin
+            y -= size * 1.3
+            x = margin + indent + (10 if kind == "bullet" and i else 0)
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            lines.append(f"BT /{font} {size} Tf {x:.0f} {y:.0f} Td ({escaped}) Tj ET")
+    pages.append(lines)
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page_lines in pages:
+        stream = "\n".join(page_lines)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+    xref_offset = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1'))
+    return output.getvalue()
+
+# Build a downloadable report in the requested format
+def export_report(analysis_text, report_format="docx", parsed=None):
+    """Return the report as raw bytes ("docx", "pdf" or "md"), memoized per analysis text.
+
+    Meant to be passed (bound) as a download button's data callable, so nothing is
+    rendered until the user actually downloads.
+    """
+    key = (make_cache_key(analysis_text), report_format)
+    with _report_cache_lock:
+        if key in _report_cache:
+            _report_cache.move_to_end(key)
+            return _report_cache[key]
+
+    with metrics.stage(f"export {report_format}"):
+        if report_format == "md":
+            data = f"# {REPORT_TITLE}\n\n{analysis_text}\n".encode('utf-8')
+        else:
+            blocks = _report_blocks(parsed or parse_analysis(analysis_text))
+            data = _render_docx(blocks) if report_format == "docx" else _render_pdf(blocks)
+
+    with _report_cache_lock:
+        _report_cache[key] = data
+        while len(_report_cache) > REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+    return data
+
+# Function to create a downloadable Word document
+def create_word_doc(analysis_text, parsed=None):
+    """Create a Word document from the analysis text and return its bytes."""
+    try:
+        return export_report(analysis_text, "docx", parsed)
     except Exception as e:
         st.error(f"Error creating Word document: {str(e)}")
         return None
@@ -255,102 +1762,288 @@ def get_decision_levels():
         "REJECT": {"color": "#EA4335", "description": "Candidate does not meet essential requirements for this role."}
     }
 
-# Extract Overall Rating (1-5) from analysis text
-def extract_overall_rating(analysis_text):
-    """Extracts the overall rating (1-5) from the analysis text."""
-    rating = {"Overall Rating": 0}
-    match = re.search(r"Overall Rating(?:.*?Score\s*:\s*)?(\b[1-5](?:\.\d)?\b)\s*/\s*5", analysis_text, re.IGNORECASE | re.DOTALL)
-    
-    if match:
-        try:
-            rating_value = float(match.group(1))
-            if 1 <= rating_value <= 5:
-                rating["Overall Rating"] = rating_value
-        except (ValueError, IndexError):
-            pass
+SECTION_TITLES = {
+    1: "Interview Overview",
+    2: "Candidate Background Summary",
+    3: "Key Questions and Candidate Responses",
+    4: "Job Description Alignment Analysis",
+    5: "Communication and Professionalism",
+    6: "Interviewer Performance (Brief)",
+    7: "Overall Assessment",
+    8: "Final Decision Recommendation",
+}
 
-    if rating["Overall Rating"] == 0:
-        if "7. Overall Assessment" in analysis_text:
-            assessment_section = analysis_text.split("7. Overall Assessment")[1].split("8. Final Decision Recommendation")[0]
-            numbers = re.findall(r'\b([1-5](?:\.\d)?)\b', assessment_section)
-            if numbers:
-                try:
-                    rating["Overall Rating"] = float(numbers[0])
-                except ValueError:
-                    pass
+# Sections written from the transcript alone; the others also depend on the job description
+# (1 names the role "based on JD", 2 lists skills relevant to it)
+TRANSCRIPT_SECTIONS = (3, 5)
+
+SECTION_HEADING_PATTERN = re.compile(r'^[#*\s]*([1-8])\.\s+\**\s*([^*\n]+?)\s*\**\s*:?\s*$')
+RATING_PATTERN = re.compile(r'(?<![\d.])([1-5](?:\.\d)?)\s*/\s*5\b')
+CONFIDENCE_PATTERN = re.compile(r'Confidence(?: Level)?\b[^:\n]*:[\s*_]*(Low|Medium|High)', re.IGNORECASE)
+
+def _is_section_heading(line, number, title, current_number):
+    """Numbered lines are section headings if they name a known section, or are the next bold/# heading."""
+    known_title = SECTION_TITLES[number].split(' (')[0].lower()
+    if title.lower().startswith(known_title):
+        return True
+    return number == current_number + 1 and line.startswith(('**', '#'))
+
+# Index an analysis into sections and key fields in a single pass
+def parse_analysis(analysis_text, decision_levels=None):
+    """Parse free-text (Markdown) analysis into the same structure as the JSON output mode.
+
+    Returns a dict with "preamble", "sections" ([{"number", "title", "content"}]),
+    "overall_rating" (0 if missing), "decision", "confidence", "questions" and
+    "bias_check". Results are memoized, so repeated calls with the same text are free.
+    """
+    levels = tuple((decision_levels or get_decision_levels()).keys())
+    return _parse_analysis_text(analysis_text, levels)
+
+@functools.lru_cache(maxsize=64)
+def _parse_analysis_text(analysis_text, levels):
+    parsed = {
+        "source": "markdown",
+        "preamble": "",
+        "sections": [],
+        "overall_rating": 0,
+        "decision": None,
+        "confidence": None,
+        "questions": [],
+        "bias_check": None,
+    }
+    preamble, bias_lines, current = [], None, None
+    rating_lookahead = 0
 
-    return rating
+    for line in analysis_text.split('\n'):
+        stripped = line.strip()
+        if bias_lines is not None:
+            bias_lines.append(line)
+            continue
+        if stripped.startswith('## Bias Check'):
+            bias_lines = []
+            continue
+
+        heading = SECTION_HEADING_PATTERN.match(stripped)
+        if heading and _is_section_heading(stripped, int(heading.group(1)), heading.group(2),
+                                           current["number"] if current else 0):
+            current = {"number": int(heading.group(1)), "title": heading.group(2).strip(), "lines": []}
+            parsed["sections"].append(current)
+            continue
+
+        (current["lines"] if current else preamble).append(line)
+        lowered = stripped.lower()
+
+        # The score may sit on the "Overall Rating" line or just after it
+        if not parsed["overall_rating"]:
+            if "overall rating" in lowered:
+                rating_lookahead = 3
+            if rating_lookahead:
+                rating_lookahead -= 1
+                match = RATING_PATTERN.search(stripped)
+                if match and 1 <= float(match.group(1)) <= 5:
+                    parsed["overall_rating"] = float(match.group(1))
+
+        if parsed["decision"] is None and "recommendation" in lowered and ':' in stripped:
+            after_colon = stripped.split(':', 1)[1].upper()
+            found = [(after_colon.find(level), level) for level in levels if level in after_colon]
+            if found:
+                parsed["decision"] = min(found)[1]
+
+        if parsed["confidence"] is None and "confidence" in lowered:
+            match = CONFIDENCE_PATTERN.search(stripped)
+            if match:
+                parsed["confidence"] = match.group(1).capitalize()
+
+        if current and current["number"] == 3 and stripped.startswith(('* ', '- ', '+ ')):
+            _index_question_line(parsed["questions"], stripped[2:].strip())
+
+    for section in parsed["sections"]:
+        section["content"] = '\n'.join(section.pop("lines")).strip()
+    parsed["preamble"] = '\n'.join(preamble).strip()
+    if bias_lines is not None:
+        parsed["bias_check"] = '\n'.join(bias_lines).strip()
+
+    # Fall back to the first 1-5 number in the Overall Assessment section
+    if not parsed["overall_rating"]:
+        for section in parsed["sections"]:
+            if section["number"] == 7:
+                # Whole number tokens in range, so "5.5/5" yields neither 5.5 nor the "/5" scale
+                numbers = [float(number) for number in
+                           re.findall(r'(?<![/\d.])(?<!/ )(\d+(?:\.\d+)?)(?![\d.]*\d)', section["content"])]
+                numbers = [number for number in numbers if 1 <= number <= 5]
+                if numbers:
+                    parsed["overall_rating"] = numbers[0]
+                break
+    return parsed
+
+def _index_question_line(questions, text):
+    """Collect question/answer/quality bullets from the Key Questions section."""
+    plain = text.replace('*', '').strip()
+    label = plain.split(':', 1)[0].lower() if ':' in plain else ""
+    if label.startswith(("response", "answer", "candidate")) and questions:
+        questions[-1]["answer"] = plain.split(':', 1)[1].strip()
+    elif label.startswith(("quality", "analysis", "assessment")) and questions:
+        questions[-1]["quality"] = plain.split(':', 1)[1].strip()
+    elif plain.endswith('?') or label.startswith("question"):
+        question = plain.split(':', 1)[1].strip() if label.startswith("question") else plain
+        questions.append({"question": question, "answer": "", "quality": ""})
+
+# Extract Overall Rating (1-5) from analysis text
+def extract_overall_rating(analysis_text, parsed=None):
+    """Extracts the overall rating (1-5) from the analysis text."""
+    parsed = parsed or parse_analysis(analysis_text)
+    return {"Overall Rating": parsed["overall_rating"]}
 
 # Function to determine decision level from analysis text
-def extract_decision_level(analysis_text, decision_levels):
+def extract_decision_level(analysis_text, decision_levels, parsed=None):
     """Extracts the final decision level and description from the analysis text with improved accuracy."""
-    # Default to HOLD as a middle ground
-    result = {
-        "level": "HOLD",
-        "color": decision_levels["HOLD"]["color"],
-        "description": decision_levels["HOLD"]["description"]
-    }
-    
-    # Look for specific recommendation section
-    recommendation_patterns = [
-        r"(?:Recommendation|RECOMMENDATION):\s*([A-Za-z]+)",
-        r"(?:Final Decision|FINAL DECISION)(?:.*?)(?:Recommendation|RECOMMENDATION):\s*([A-Za-z]+)",
-        r"8\.\s+(?:.*?)(?:Recommendation|RECOMMENDATION):\s*([A-Za-z]+)"
-    ]
-    
-    for pattern in recommendation_patterns:
-        match = re.search(pattern, analysis_text, re.IGNORECASE)
-        if match:
-            level_found = match.group(1).upper().strip()
-            # Check if the found level is in our defined levels
-            for key in decision_levels.keys():
-                if key in level_found:
-                    result = {
-                        "level": key,
-                        "color": decision_levels[key]["color"],
-                        "description": decision_levels[key]["description"]
-                    }
-                    return result
-    
-    # If we're still using the default, check for bias correction
-    if result["level"] == "HOLD" and "## Bias Check" in analysis_text:
-        bias_section = analysis_text.split("## Bias Check")[1]
-        for key in decision_levels.keys():
-            if key in bias_section.upper():
-                result = {
-                    "level": key,
-                    "color": decision_levels[key]["color"],
-                    "description": decision_levels[key]["description"]
-                }
-                return result
-    
+    parsed = parsed or parse_analysis(analysis_text, decision_levels)
+    level = parsed["decision"]
+
+    # If no explicit recommendation was found, check for bias correction
+    if level is None and parsed["bias_check"]:
+        bias_section = parsed["bias_check"].upper()
+        level = next((key for key in decision_levels.keys() if key in bias_section), None)
+
     # As a backup, correlate with overall rating
-    overall_rating = extract_overall_rating(analysis_text).get("Overall Rating", 0)
-    if overall_rating > 0:
-        # Map rating to decision level
+    overall_rating = parsed["overall_rating"]
+    if level is None and overall_rating > 0:
         if overall_rating >= 4:
-            result = {
-                "level": "SELECT",
-                "color": decision_levels["SELECT"]["color"],
-                "description": decision_levels["SELECT"]["description"]
-            }
+            level = "SELECT"
         elif overall_rating >= 2.5:
-            result = {
-                "level": "HOLD",
-                "color": decision_levels["HOLD"]["color"],
-                "description": decision_levels["HOLD"]["description"]
-            }
+            level = "HOLD"
         else:
-            result = {
-                "level": "REJECT",
-                "color": decision_levels["REJECT"]["color"],
-                "description": decision_levels["REJECT"]["description"]
-            }
-            
-    return result
+            level = "REJECT"
+
+    # Default to HOLD as a middle ground
+    level = level or "HOLD"
+    return {
+        "level": level,
+        "color": decision_levels[level]["color"],
+        "description": decision_levels[level]["description"]
+    }
+
+# HTML for the colored rating bar
+def rating_bar_html(overall_rating):
+    if overall_rating >= 4:
+        rating_color = "#34A853"
+    elif overall_rating >= 2.5:
+        rating_color = "#FBBC04"
+    else:
+        rating_color = "#EA4335"
+
+    return f"""
+                <div style="width: 90%; background-color: #e0e0e0; border-radius: 5px; margin-top: 5px;">
+                    <div style="width: {float(overall_rating) * 20}%; background-color: {rating_color}; height: 20px; border-radius: 5px; text-align: center; color: white; font-weight: bold; line-height: 20px;">
+                        {overall_rating}/5
+                    </div>
+                </div>
+                """
+
+# HTML for the SELECT/HOLD/REJECT badge
+def decision_badge_html(decision):
+    return (f"<div style='padding:10px; background-color:{decision['color']}20; border-left: 5px solid {decision['color']}; border-radius: 5px; margin-bottom: 10px;'>"
+            f"<strong style='color:{decision['color']}; font-size: 1.1em;'>{decision['level']}</strong>: {decision['description']}"
+            f"</div>")
+
+# Live progress of a background analysis job, refreshed every second without rerunning the page
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id, decision_levels):
+    job = get_job_queue().get(job_id)
+    if job is None or job["status"] in (job_queue.DONE, job_queue.FAILED):
+        # Rerun the whole page so it renders the finished report (or the error)
+        st.rerun()
+
+    st.write("🔍 Analyzing Interview Transcript...")
+    streamed_text = job["progress_text"]
+    live_state = extract_live_indicators(streamed_text, decision_levels, {}) if streamed_text else {}
+    st.progress(min(95, live_state.get("section", 0) * 12))
+    if job["status"] == job_queue.QUEUED:
+        st.text(f"Waiting for a free worker ({job['queue_position']} analyses ahead)...")
+    else:
+        st.text(job["status_message"] or "Generating objective analysis...")
+    st.caption(f"Job {job_id}. You can leave or refresh this page; the analysis keeps running.")
+
+    live_col1, live_col2 = st.columns([1, 2])
+    if live_state.get("rating"):
+        live_col1.markdown(rating_bar_html(live_state["rating"]), unsafe_allow_html=True)
+    if live_state.get("decision"):
+        live_col2.markdown(decision_badge_html(live_state["decision"]), unsafe_allow_html=True)
+    if streamed_text:
+        st.markdown(streamed_text)
+
+# Rank and compare stored candidates for one requisition, without any model calls
+def show_ranking_view(decision_levels):
+    st.header("🏆 Candidate Ranking")
+    store = get_results_store()
+    requisitions = store.requisitions()
+    if not requisitions:
+        st.info("No analyses stored yet. Analyzed candidates appear here automatically.")
+        return
+
+    labels = {f"{req['requisition']} ({req['candidates']} candidates, JD {req['jd_hash'][:8]})": req
+              for req in requisitions}
+    selected = labels[st.selectbox("Requisition", list(labels))]
+    summary_cols = st.columns(4)
+    summary_cols[0].metric("Candidates", selected["candidates"])
+    summary_cols[1].metric("SELECT", selected["selected"] or 0)
+    summary_cols[2].metric("HOLD", selected["held"] or 0)
+    summary_cols[3].metric("REJECT", selected["rejected"] or 0)
+
+    filter_cols = st.columns([2, 1, 1, 2])
+    decisions = filter_cols[0].multiselect("Decision", list(decision_levels), default=list(decision_levels))
+    min_rating = filter_cols[1].number_input("Minimum rating", min_value=0.0, max_value=5.0, value=0.0, step=0.5)
+    order = filter_cols[2].selectbox("Sort by", list(results_store.SORT_ORDERS))
+    search = filter_cols[3].text_input("Search name")
+
+    rows = store.rank(jd_hash=selected["jd_hash"], decisions=decisions, min_rating=min_rating,
+                      search=search.strip() or None, order=order)
+    table = [{
+        "rank": rank,
+        "candidate": row["candidate_name"] or row["file_name"] or f"Result {row['id']}",
+        "file": row["file_name"],
+        "rating": row["overall_rating"],
+        "decision": row["decision"],
+        "confidence": row["confidence"],
+        "bias review": bool(row["bias_review"]),
+        "analyzed": datetime.datetime.fromtimestamp(row["updated_at"]).strftime("%Y-%m-%d %H:%M"),
+        "id": row["id"],
+    } for rank, row in enumerate(rows, 1)]
+    st.dataframe(table, hide_index=True)
+    st.download_button("Download ranking (CSV)", data=lambda: _ranking_csv(table),
+                       file_name="candidate_ranking.csv", mime="text/csv")
+
+    # Side-by-side comparison of the sections that drive the decision
+    names = {f"#{entry['rank']} {entry['candidate']}": entry["id"] for entry in table}
+    compared = st.multiselect("Compare candidates", list(names), default=list(names)[:min(2, len(names))],
+                              max_selections=4)
+    if compared:
+        compare_cols = st.columns(len(compared))
+        for compare_col, name in zip(compare_cols, compared):
+            stored = store.get(names[name])
+            with compare_col:
+                st.subheader(name)
+                st.markdown(rating_bar_html(stored["overall_rating"]), unsafe_allow_html=True)
+                if stored["decision"] in decision_levels:
+                    st.markdown(decision_badge_html({"level": stored["decision"], **decision_levels[stored["decision"]]}),
+                                unsafe_allow_html=True)
+                for section in stored["parsed"]["sections"]:
+                    if section["number"] in (4, 7):
+                        st.markdown(f"**{section['title']}**")
+                        st.markdown(section["content"])
+                with st.expander("Full analysis"):
+                    st.markdown(stored["analysis"])
+
+def _ranking_csv(table):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(table[0]) if table else ["rank"])
+    writer.writeheader()
+    writer.writerows(table)
+    return output.getvalue().encode('utf-8')
 
 # Streamlit App
 def main():
+    rerun_started = time.perf_counter()
     st.set_page_config(
         page_title="Interview Transcript Analyzer", 
         page_icon="📋",
@@ -360,8 +2053,15 @@ def main():
     st.title("🤝 Interview Transcript Analyzer")
     st.markdown("Analyzes interview transcripts against job descriptions, providing objective assessment and recommendations.")
 
-    configure_gemini_api()
     decision_levels = get_decision_levels()
+    view = st.sidebar.radio("View", ["Analyze Transcript", "Candidate Ranking"])
+    if view == "Candidate Ranking":
+        # Reads stored results only, so it works without configuring the model
+        show_ranking_view(decision_levels)
+        return
+
+    if MODEL_BACKEND == "gemini":
+        configure_gemini_api()
     
     col1, col2 = st.columns(2)
     
@@ -397,7 +2097,15 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
+    requisition = st.text_input(
+        "Requisition (optional)",
+        help="Groups candidates in the Candidate Ranking view. Defaults to the first line of the job description."
+    )
     analyze_button = st.button("Analyze Transcript", type="primary", disabled=(not transcript_file or not job_desc_file))
+    bypass_cache = st.checkbox(
+        "Bypass result cache",
+        help="Force a fresh analysis even if these exact files were analyzed before."
+    )
 
     if 'analysis_result' not in st.session_state:
         st.session_state.analysis_result = None
@@ -408,22 +2116,19 @@ def main():
         st.session_state.analysis_result = None
         st.session_state.error_message = None
 
-        transcript_text = read_file_content(transcript_file)
-        job_description = read_file_content(job_desc_file)
-        
-        if transcript_text and job_description:
-            st.write("🔍 Analyzing Interview Transcript...")
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            status_text.text("Generating objective analysis...")
-            
-            with st.spinner("AI is processing the transcript and job description..."):
-                analysis_result = generate_interview_analysis(transcript_text, job_description, decision_levels)
-                st.session_state.analysis_result = analysis_result
-            
-            progress_bar.progress(100)
-            status_text.text("Analysis Complete!")
+        with metrics.run("ui"):
+            with metrics.stage("extract transcript"):
+                transcript_text = read_file_content(transcript_file)
+            with metrics.stage("extract job description"):
+                job_description = read_file_content(job_desc_file)
 
+        if transcript_text and job_description:
+            # The analysis runs on a background worker; the page only polls it, so reruns and
+            # refreshes no longer interrupt it and the job ID in the URL lets the page reattach
+            job_id = submit_analysis_job(transcript_text, job_description, use_cache=not bypass_cache,
+                                         file_name=transcript_file.name, requisition=requisition.strip() or None)
+            st.session_state.job_id = job_id
+            st.query_params["job"] = job_id
         else:
             error_msgs = []
             if not transcript_text:
@@ -433,6 +2138,38 @@ def main():
             st.session_state.error_message = "\n".join(error_msgs)
             st.error(st.session_state.error_message)
 
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    if job_id and not st.session_state.analysis_result and not st.session_state.error_message:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            st.warning(f"Analysis job {job_id} was not found; it may have expired.")
+            st.session_state.job_id = None
+            del st.query_params["job"]
+        elif job["status"] == job_queue.DONE:
+            st.session_state.job_id = job_id
+            st.session_state.analysis_result = job["result"]
+            st.session_state.analysis_metrics = job["result"].get("metrics")
+            analysis_stats = get_cache_stats().get("analysis", {})
+            review_stats = get_review_stats()
+            st.success("Analysis Complete! (served from cache)" if job["result"].get("cached") else "Analysis Complete!")
+            st.caption(f"Result cache: {analysis_stats.get('hits', 0)} hits, {analysis_stats.get('misses', 0)} misses since server start. "
+                       f"Bias review skipped for {review_stats['skipped']} of {review_stats['run'] + review_stats['skipped']} analyses.")
+            compaction = job["result"].get("compaction")
+            if compaction and compaction["tokens_before"] > compaction["tokens_after"]:
+                saved = 1 - compaction["tokens_after"] / compaction["tokens_before"]
+                st.caption(f"Transcript compacted: {compaction['tokens_before']:,} → {compaction['tokens_after']:,} "
+                           f"estimated tokens (−{saved:.0%}).")
+            routing = job["result"].get("routing")
+            if routing:
+                st.caption(f"Escalated from {routing['fast_model']} to {routing['strong_model']}: "
+                           f"{', '.join(routing['reasons']).lower()}." if routing["escalated"]
+                           else f"Analyzed by the fast model ({routing['fast_model']}) without escalation.")
+        elif job["status"] == job_queue.FAILED:
+            st.session_state.error_message = f"Failed to generate analysis: {job['error']}"
+        else:
+            st.session_state.job_id = job_id
+            show_job_progress(job_id, decision_levels)
+
     if st.session_state.analysis_result:
         analysis_content = st.session_state.analysis_result.get("analysis", "")
         
@@ -442,9 +2179,11 @@ def main():
             st.header("📄 Interview Analysis Report")
             
             analysis_text = analysis_content
-            rating_data = extract_overall_rating(analysis_text)
+            # Parse once; the rating, decision and Word export all read from the same structure
+            parsed = st.session_state.analysis_result.get("parsed") or parse_analysis(analysis_text, decision_levels)
+            rating_data = extract_overall_rating(analysis_text, parsed)
             overall_rating = rating_data.get("Overall Rating", 0)
-            decision = extract_decision_level(analysis_text, decision_levels)
+            decision = extract_decision_level(analysis_text, decision_levels, parsed)
             
             st.markdown("---")
             metrics_col1, metrics_col2 = st.columns([1, 2])
@@ -452,27 +2191,13 @@ def main():
             with metrics_col1:
                 st.markdown("#### Overall Rating")
                 st.metric(label="Overall Rating", value=f"{overall_rating} / 5")
-                
-                if overall_rating >= 4:
-                    rating_color = "#34A853"
-                elif overall_rating >= 2.5:
-                    rating_color = "#FBBC04"
-                else:
-                    rating_color = "#EA4335"
-                
-                st.markdown(f"""
-                <div style="width: 90%; background-color: #e0e0e0; border-radius: 5px; margin-top: 5px;">
-                    <div style="width: {float(overall_rating) * 20}%; background-color: {rating_color}; height: 20px; border-radius: 5px; text-align: center; color: white; font-weight: bold; line-height: 20px;">
-                        {overall_rating}/5
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(rating_bar_html(overall_rating), unsafe_allow_html=True)
 
             with metrics_col2:
                 st.markdown(f"#### Final Decision Recommendation")
-                st.markdown(f"<div style='padding:10px; background-color:{decision['color']}20; border-left: 5px solid {decision['color']}; border-radius: 5px; margin-bottom: 10px;'>"
-                            f"<strong style='color:{decision['color']}; font-size: 1.1em;'>{decision['level']}</strong>: {decision['description']}"
-                            f"</div>", unsafe_allow_html=True)
+                st.markdown(decision_badge_html(decision), unsafe_allow_html=True)
+                if parsed.get("confidence"):
+                    st.caption(f"Confidence Level: {parsed['confidence']}")
                 
                 # Add a note if decision and rating seem misaligned
                 if (overall_rating >= 4 and decision['level'] != "SELECT") or \
@@ -488,16 +2213,22 @@ def main():
             
             st.markdown("---")
             st.markdown(f"### Download Report")
-            word_link = create_word_doc(analysis_text)
-            if word_link:
-                st.download_button(
-                    label="Download Analysis as Word Document (.docx)",
-                    data=base64.b64decode(word_link.split(',')[1]),
-                    file_name="interview_analysis_report.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-            else:
-                st.warning("Could not generate Word document for download.")
+            # Reports are rendered only when a button is clicked (data is a callable), then memoized
+            download_cols = st.columns(len(REPORT_FORMATS))
+            for download_col, (report_format, info) in zip(download_cols, REPORT_FORMATS.items()):
+                with download_col:
+                    st.download_button(
+                        label=f"Download Analysis as {info['label']}",
+                        data=functools.partial(export_report, analysis_text, report_format, parsed),
+                        file_name=f"interview_analysis_report.{report_format}",
+                        mime=info["mime"],
+                        key=f"download_{report_format}"
+                    )
+            missing_characters = pdf_missing_characters(analysis_text)
+            if missing_characters:
+                st.caption(f"The PDF report cannot show {len(missing_characters)} character(s) used here "
+                           f"({''.join(missing_characters[:10])}); they appear as '?'. "
+                           f"The Word and Markdown reports keep the full text.")
                  
     elif st.session_state.error_message:
         st.error(st.session_state.error_message)
@@ -510,5 +2241,44 @@ def main():
         if transcript_file and job_desc_file:
             st.info("Click the 'Analyze Transcript' button to generate the report.")
 
+    # Script overhead of an ordinary widget interaction (runs that analyze are excluded)
+    if not analyze_button:
+        record_rerun_timing(time.perf_counter() - rerun_started)
+    with st.expander("Diagnostics"):
+        run_metrics = st.session_state.get("analysis_metrics")
+        if run_metrics:
+            st.caption(f"Last analysis: {run_metrics['seconds']:.2f}s, {run_metrics['prompt_tokens']} prompt and "
+                       f"{run_metrics['response_tokens']} response tokens, estimated cost ${run_metrics['cost_usd']:.4f}.")
+            st.table(run_metrics["stages"])
+            if run_metrics["events"]:
+                st.json(run_metrics["events"])
+        aggregates = metrics.snapshot()["stages"]
+        if aggregates:
+            st.caption("Wall time per stage across all runs in this server process (milliseconds).")
+            st.table([{"stage": name, "calls": stats["count"],
+                       **{key: round(stats[key] * 1000, 1) for key in ("p50", "p90", "p99", "max")},
+                       "tokens": stats["prompt_tokens"] + stats["response_tokens"],
+                       "cost (USD)": round(stats["cost_usd"], 4)}
+                      for name, stats in sorted(aggregates.items())])
+        routing_stats = model_router.routing_stats()
+        if routing_stats["routed"]:
+            st.caption(f"Model routing: {routing_stats['escalated']} of {routing_stats['routed']} analyses escalated "
+                       f"to the strong model ({routing_stats['escalation_rate']:.0%}).")
+            if routing_stats["reasons"]:
+                st.json(routing_stats["reasons"])
+        diag_col1, diag_col2 = st.columns(2)
+        diag_col1.download_button("Download Prometheus metrics", data=metrics.prometheus_text,
+                                  file_name="analysis_metrics.prom", mime="text/plain")
+        diag_col2.download_button("Download run log (JSON)",
+                                  data=lambda: json.dumps(metrics.recent_runs(), indent=2, default=str),
+                                  file_name="analysis_runs.json", mime="application/json")
+
+    with st.expander("Startup and Rerun Overhead"):
+        st.caption("Milliseconds, measured once per server process for imports and client setup.")
+        st.json({name: round(seconds * 1000, 1) for name, seconds in get_startup_timings().items()})
+
+# Reruns re-execute the module too; only the first execution is the import
+STARTUP_TIMINGS.setdefault("import app module", time.perf_counter() - _import_started)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,52 @@
+"""Process-wide state for app.py.
+
+Streamlit executes app.py as a fresh __main__ module on every rerun, so globals
+defined there start over each time. Everything that must exist once per server
+process (the configured Gemini client, model objects, lazily imported modules,
+caches, counters and the background event loop) lives here instead: this module
+is imported once and stays in sys.modules, like job_queue and results_store.
+"""
+import collections
+import threading
+
+import resilient_client
+
+# Heavy modules imported on first use; guards the client and model objects too
+resource_lock = threading.RLock()
+lazy_modules = {}
+
+# The Gemini client is configured once; model objects are shared by every session
+gemini_configured = False
+models = {}
+
+# Import/configuration timings and per-rerun overhead, in seconds
+startup_timings = {}
+rerun_timings = collections.deque(maxlen=200)
+
+# Disk cache hit/miss/write/eviction counters per namespace, and the running total of its size
+# (None until the first scan; eviction rescans the directory to correct it)
+cache_lock = threading.Lock()
+cache_stats = {}
+cache_size_bytes = None
+cache_scanned_at = 0.0
+cache_evicting = False
+
+# How often the LLM bias review ran or was skipped
+review_stats = {"run": 0, "skipped": 0}
+review_stats_lock = threading.Lock()
+
+# Job description profiles, with concurrent builds of the same profile sharing one model call
+jd_profiles = {}
+jd_profile_flight = resilient_client.SingleFlight()
+
+# Gemini context caches by prefix key: (cached model, expiry time)
+context_caches = {}
+context_cache_lock = threading.Lock()
+
+# Rendered report exports, most recently used last
+report_cache = collections.OrderedDict()
+report_cache_lock = threading.Lock()
+
+# Background event loop shared by every session and batch run
+async_loop = None
+async_loop_lock = threading.Lock()
@@ -0,0 +1,293 @@
+"""Headless batch runner: analyze a folder of transcripts against one job description.
+
+Usage:
+    python batch_analyze.py transcripts/ --job-description jd.pdf --output-dir results/ --workers 4 --rpm 30
+
+Per-candidate reports are written to <output-dir>/reports and every finished
+candidate is appended to <output-dir>/summary.jsonl. Re-running the same
+command skips candidates that already completed, so a crashed run can be
+resumed. A summary.csv is rebuilt from the JSONL at the end of each run.
+Results are also saved to the results store for the app's Candidate Ranking view.
+"""
+import argparse
+import csv
+import io
+import json
+import mimetypes
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import app
+import metrics
+import model_router
+
+SUPPORTED_EXTENSIONS = {
+    '.txt': 'text/plain',
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+SUMMARY_FIELDS = ["file", "status", "overall_rating", "decision", "cached", "bias_review", "report", "error", "seconds"]
+
+
+class LocalFile(io.BytesIO):
+    """A file on disk wrapped to look like a Streamlit UploadedFile."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        extension = os.path.splitext(path)[1].lower()
+        self.type = SUPPORTED_EXTENSIONS.get(extension) or mimetypes.guess_type(path)[0] or 'text/plain'
+
+
+def find_transcripts(transcripts_dir):
+    """Return the supported transcript files in the directory, sorted by name."""
+    paths = []
+    for name in sorted(os.listdir(transcripts_dir)):
+        path = os.path.join(transcripts_dir, name)
+        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+            paths.append(path)
+    return paths
+
+
+def load_completed(summary_path):
+    """Return the file names that already finished successfully in earlier runs."""
+    completed = set()
+    if not os.path.exists(summary_path):
+        return completed
+    with open(summary_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated last line behind
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["file"])
+    return completed
+
+
+def analyze_one(path, job_description, decision_levels, model, reports_dir, use_cache, requisition=None):
+    """Analyze a single transcript, write its report and store the result; returns the summary record."""
+    started = time.monotonic()
+    with metrics.run("analysis", file=os.path.basename(path)):
+        with metrics.stage("extract transcript"):
+            transcript_text = app.read_file_content(LocalFile(path))
+        if not transcript_text:
+            return {"file": os.path.basename(path), "status": "error", "error": "Could not read transcript file."}
+
+        result = app.generate_interview_analysis(transcript_text, job_description, decision_levels,
+                                                 use_cache=use_cache, model=model)
+        app.save_result(result, transcript_text, job_description, os.path.basename(path), requisition)
+        return record_result(path, result, decision_levels, reports_dir, started)
+
+
+def record_result(path, result, decision_levels, reports_dir, started):
+    """Write the report for a finished analysis and return its summary record."""
+    name = os.path.basename(path)
+    record = {"file": name, "status": "error"}
+    analysis_text = result.get("analysis", "")
+    if not analysis_text or "Could not generate analysis" in analysis_text or "Could not configure" in analysis_text:
+        record["error"] = analysis_text or "Empty analysis."
+        return record
+
+    # Keep the extension in the report name so c1.txt and c1.pdf do not collide
+    report_path = os.path.join(reports_dir, name + ".md")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(analysis_text)
+
+    parsed = result.get("parsed") or app.parse_analysis(analysis_text, decision_levels)
+    record.update({
+        "status": "ok",
+        "overall_rating": app.extract_overall_rating(analysis_text, parsed).get("Overall Rating", 0),
+        "decision": app.extract_decision_level(analysis_text, decision_levels, parsed)["level"],
+        "cached": bool(result.get("cached")),
+        "bias_review": bool(result.get("review", {}).get("ran")),
+        "report": os.path.relpath(report_path, os.path.dirname(reports_dir)),
+        "seconds": round(time.monotonic() - started, 3),
+    })
+    return record
+
+
+def write_summary_csv(summary_path, csv_path):
+    """Rebuild the CSV summary from the JSONL log, keeping the latest record per file."""
+    latest = {}
+    with open(summary_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            latest[record["file"]] = record
+
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for name in sorted(latest):
+            writer.writerow(latest[name])
+
+
+def build_model(args):
+    """Create the model used for the run: the local fake or a configured Gemini model.
+
+    The model goes through the backend's shared rate limiter; --rpm resizes it. With
+    --route (or MODEL_ROUTING=1) it is a fast/strong pair that escalates uncertain results.
+    """
+    backend = "fake" if args.fake_model else app.MODEL_BACKEND
+    if backend == "gemini" and not os.getenv("GOOGLE_API_KEY"):
+        sys.exit("Google API key not found. Set GOOGLE_API_KEY or use --fake-model.")
+    if args.rpm is not None:
+        app.get_rate_limiter(backend).set_rate(args.rpm)
+    options = {"latency": args.fake_latency, "error_rate": args.fake_error_rate} if args.fake_model else {}
+    if args.route:
+        return app.get_tiered_model(backend, **options)
+    if args.fake_model:
+        return app.get_model_backend("fake", **options)
+    return app.get_model_backend(backend)
+
+
+def run_batch(args):
+    """Analyze every pending transcript and return (succeeded, failed, skipped) counts."""
+    reports_dir = os.path.join(args.output_dir, "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, "summary.jsonl")
+
+    job_description = app.read_file_content(LocalFile(args.job_description))
+    if not job_description:
+        sys.exit(f"Could not read job description file '{args.job_description}'.")
+
+    decision_levels = app.get_decision_levels()
+    model = build_model(args)
+
+    # Build the job description profile once up front; every candidate reuses it
+    app.get_jd_profile(job_description, model)
+
+    transcripts = find_transcripts(args.transcripts_dir)
+    completed = load_completed(summary_path)
+    pending = [path for path in transcripts if os.path.basename(path) not in completed]
+    print(f"{len(transcripts)} transcripts found, {len(completed & {os.path.basename(p) for p in transcripts})} "
+          f"already done, {len(pending)} to analyze.")
+
+    counts = {"ok": 0, "error": 0}
+    summary_lock = threading.Lock()
+    with open(summary_path, 'a', encoding='utf-8') as summary_file:
+        def save(record):
+            with summary_lock:
+                summary_file.write(json.dumps(record) + "\n")
+                summary_file.flush()
+                os.fsync(summary_file.fileno())
+                counts[record["status"]] += 1
+            if record["status"] == "ok":
+                print(f"[ok] {record['file']}: {record['overall_rating']}/5 {record['decision']}")
+            else:
+                print(f"[error] {record['file']}: {record.get('error')}")
+
+        if args.use_async:
+            run_pipelined(pending, job_description, decision_levels, model, reports_dir, args, save)
+        else:
+            run_threaded(pending, job_description, decision_levels, model, reports_dir, args, save)
+
+    if os.path.exists(summary_path):
+        write_summary_csv(summary_path, os.path.join(args.output_dir, "summary.csv"))
+    return counts["ok"], counts["error"], len(transcripts) - len(pending)
+
+
+def run_threaded(pending, job_description, decision_levels, model, reports_dir, args, save):
+    """Analyze pending transcripts on a pool of worker threads."""
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(analyze_one, path, job_description, decision_levels, model,
+                            reports_dir, not args.no_cache, args.requisition): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"file": os.path.basename(path), "status": "error", "error": str(e)}
+            save(record)
+
+
+def run_pipelined(pending, job_description, decision_levels, model, reports_dir, args, save):
+    """Analyze pending transcripts with the asyncio pipeline, overlapping reviews and analyses."""
+    started = time.monotonic()
+    readable = []
+    for path in pending:
+        transcript_text = app.read_file_content(LocalFile(path))
+        if transcript_text:
+            readable.append((path, transcript_text))
+        else:
+            save({"file": os.path.basename(path), "status": "error", "error": "Could not read transcript file."})
+
+    def on_result(index, result):
+        path, transcript_text = readable[index]
+        app.save_result(result, transcript_text, job_description, os.path.basename(path), args.requisition)
+        try:
+            record = record_result(path, result, decision_levels, reports_dir, started)
+        except Exception as e:
+            record = {"file": os.path.basename(path), "status": "error", "error": str(e)}
+        save(record)
+
+    app.run_async(app.analyze_candidates_async(
+        [text for _, text in readable], job_description, decision_levels, concurrency=args.workers,
+        use_cache=not args.no_cache, model=model, on_result=on_result))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory of interview transcripts against one job description.")
+    parser.add_argument("transcripts_dir", help="Directory containing .txt, .pdf or .docx transcripts.")
+    parser.add_argument("--job-description", "-j", required=True, help="Job description file (.txt, .pdf or .docx).")
+    parser.add_argument("--output-dir", "-o", default="batch_output", help="Where reports and summaries are written.")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Number of concurrent analyses.")
+    parser.add_argument("--rpm", type=float, help="Maximum model requests per minute (0 disables the limit). "
+                                                 "Defaults to MODEL_RPM for Gemini and no limit for the fake model.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Use the asyncio pipeline, overlapping each bias review with the next analysis.")
+    parser.add_argument("--requisition", "-r",
+                        help="Name grouping these candidates in the ranking view (default: first line of the job description).")
+    parser.add_argument("--route", action="store_true", default=app.MODEL_ROUTING,
+                        help="Analyze with the fast model first and escalate uncertain results to the strong model "
+                             "(FAST_MODEL_NAME / STRONG_MODEL_NAME).")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached analyses and re-run every transcript.")
+    parser.add_argument("--fake-model", action="store_true", help="Use the local fake model instead of Gemini.")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Seconds of simulated latency per fake model call.")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0,
+                        help="Fraction of fake model calls that fail with a transient 503, to exercise retries.")
+    return parser.parse_args(argv)
+
+
+def print_stage_timings():
+    """Print per-stage latency percentiles, tokens and estimated cost for the run."""
+    stages = metrics.snapshot()["stages"]
+    if not stages:
+        return
+    print(f"{'stage':<24} {'calls':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'tokens':>9} {'cost $':>9}")
+    for name, stats in sorted(stages.items()):
+        print(f"{name:<24} {stats['count']:>6} {stats['p50'] * 1000:>9.1f} {stats['p90'] * 1000:>9.1f} "
+              f"{stats['p99'] * 1000:>9.1f} {stats['prompt_tokens'] + stats['response_tokens']:>9} "
+              f"{stats['cost_usd']:>9.4f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    succeeded, failed, skipped = run_batch(args)
+    print(f"Done: {succeeded} succeeded, {failed} failed, {skipped} skipped (already complete).")
+    review_stats = app.get_review_stats()
+    print(f"Bias review calls: {review_stats['run']} run, {review_stats['skipped']} skipped "
+          f"({review_stats['skip_rate']:.0%} skipped by the consistency check).")
+    routing_stats = model_router.routing_stats()
+    if routing_stats["routed"]:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(routing_stats["reasons"].items()))
+        print(f"Model routing: {routing_stats['escalated']} of {routing_stats['routed']} escalated "
+              f"({routing_stats['escalation_rate']:.0%})" + (f" - {reasons}" if reasons else "") + ".")
+    print_stage_timings()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
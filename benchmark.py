@@ -0,0 +1,272 @@
+"""Offline benchmark suite for the interview transcript analyzer.
+
+Everything runs against the local fake model backend, so no API quota is spent.
+Results are written as JSON (one record per benchmark case) so runs from
+different commits can be compared.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --repeat 3
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Use a throwaway cache so earlier runs never make a benchmark look faster than it is
+os.environ.setdefault("ANALYSIS_CACHE_DIR", tempfile.mkdtemp(prefix="analyzer-bench-cache-"))
+
+import app
+import text_extraction
+import transcript_compaction
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "transcripts")
+
+
+class BytesUpload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, data, name, file_type):
+        super().__init__(data)
+        self.name = name
+        self.type = file_type
+
+
+def synthetic_transcript(turns):
+    """Return a transcript with the given number of interviewer/candidate exchanges."""
+    lines = ["Interview Transcript - Senior Python Developer", ""]
+    for i in range(turns):
+        lines.append(f"[00:{i // 60 % 60:02d}:{i % 60:02d}] Interviewer: Question {i + 1}: how would you design "
+                     f"a service that processes {i + 1} thousand events per second?")
+        lines.append(f"[00:{i // 60 % 60:02d}:{i % 60:02d}] Candidate: I would use a queue, partition the work, "
+                     f"add idempotent consumers and monitor latency. In my last role I built something similar "
+                     f"with Python, Kafka and PostgreSQL.")
+    return "\n".join(lines)
+
+
+def synthetic_docx(turns):
+    docx = app.lazy_import("docx")
+    doc = docx.Document()
+    for line in synthetic_transcript(turns).split("\n"):
+        doc.add_paragraph(line)
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Skill"
+    table.cell(0, 1).text = "Years"
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def synthetic_pdf(pages):
+    """Return a PDF with roughly the given number of pages of transcript text."""
+    # About 12 exchanges fill one page with the built-in PDF renderer
+    blocks = [("paragraph", line) for line in synthetic_transcript(pages * 12).split("\n") if line]
+    return app._render_pdf(blocks)
+
+
+def timed(func, repeat):
+    """Run func `repeat` times and return timing statistics in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "repeat": repeat,
+    }
+
+
+def bench_extraction(sizes, repeat):
+    results = []
+    for size in sizes:
+        files = {
+            "txt": (synthetic_transcript(size).encode("utf-8"), "text/plain"),
+            "docx": (synthetic_docx(size), text_extraction.DOCX_MIME_TYPE),
+            "pdf": (synthetic_pdf(max(1, size // 12)), text_extraction.PDF_MIME_TYPE),
+        }
+        for file_format, (data, file_type) in files.items():
+            params = {"format": file_format, "turns": size, "bytes": len(data)}
+            results.append({"name": "extract_text", "params": params,
+                            **timed(lambda: text_extraction.extract_text(data, file_type), repeat)})
+            # First call fills the content-hash cache; the timed calls measure cache hits
+            app.read_file_content(BytesUpload(data, f"bench.{file_format}", file_type))
+            results.append({"name": "read_file_content_cached", "params": params,
+                            **timed(lambda: app.read_file_content(BytesUpload(data, f"bench.{file_format}", file_type)),
+                                    repeat)})
+    return results
+
+
+def bench_prompt_building(sizes, repeat):
+    decision_levels = app.get_decision_levels()
+    job_description = "Senior Python Developer. Requires Python, SQL, distributed systems. " * 20
+    results = []
+    for size in sizes:
+        transcript = synthetic_transcript(size)
+        results.append({"name": "build_analysis_prompt", "params": {"turns": size, "chars": len(transcript)},
+                        **timed(lambda: app.build_analysis_prompt(transcript, job_description, decision_levels), repeat)})
+    return results
+
+
+def bench_parsing_and_rendering(analysis_sizes, repeat):
+    fake_model = app.lazy_import("fake_model")
+    decision_levels = app.get_decision_levels()
+    results = []
+    for size in analysis_sizes:
+        analysis = fake_model.fake_analysis(f"bench {size}", size)
+        params = {"analysis_chars": len(analysis)}
+
+        def parse_uncached():
+            app._parse_analysis_text.cache_clear()
+            parsed = app.parse_analysis(analysis, decision_levels)
+            app.extract_overall_rating(analysis, parsed)
+            app.extract_decision_level(analysis, decision_levels, parsed)
+
+        results.append({"name": "parse_rating_decision", "params": params, **timed(parse_uncached, repeat)})
+        blocks = app._report_blocks(app.parse_analysis(analysis, decision_levels))
+        results.append({"name": "render_docx", "params": params, **timed(lambda: app._render_docx(blocks), repeat)})
+        results.append({"name": "render_pdf", "params": params, **timed(lambda: app._render_pdf(blocks), repeat)})
+    return results
+
+
+def bench_compaction(repeat):
+    """Token reduction and fidelity of transcript compaction on the fixture corpus.
+
+    Each fixture lists phrases that must survive compaction (names, facts, questions)
+    and artifacts that must not; "missing" and "leftover" report any that do not hold.
+    """
+    with open(os.path.join(FIXTURE_DIR, "expected.json"), encoding="utf-8") as f:
+        expectations = json.load(f)
+    results = []
+    for file_name, expected in sorted(expectations.items()):
+        with open(os.path.join(FIXTURE_DIR, file_name), encoding="utf-8") as f:
+            text = f.read()
+        compacted, stats = transcript_compaction.compact_transcript(text)
+        tokens_before, tokens_after = app.estimate_tokens(text), app.estimate_tokens(compacted)
+        results.append({
+            "name": "compact_transcript",
+            "params": {"fixture": file_name, "chars": len(text)},
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "reduction": 1 - tokens_after / tokens_before,
+            "missing": [phrase for phrase in expected["must_contain"] if phrase not in compacted],
+            "leftover": [phrase for phrase in expected["must_not_contain"] if phrase in compacted]
+                        + [phrase for phrase, limit in expected.get("max_count", {}).items()
+                           if compacted.count(phrase) > limit],
+            "removed": {key: value for key, value in stats.items() if not key.startswith(("chars", "lines"))},
+            # Timed on the fixture repeated, the size of a long interview
+            **timed(lambda: transcript_compaction.compact_transcript(text * 50), repeat),
+        })
+    return results
+
+
+def bench_end_to_end(latency, candidates, workers, repeat):
+    model = app.get_model_backend("fake", latency=latency)
+    decision_levels = app.get_decision_levels()
+    job_description = "Senior Python Developer. Requires Python, SQL, distributed systems."
+    transcripts = [synthetic_transcript(20) + f"\nCandidate {i}" for i in range(candidates)]
+    results = []
+
+    single = timed(lambda: app.generate_interview_analysis(transcripts[0], job_description, decision_levels,
+                                                           use_cache=False, model=model), repeat)
+    results.append({"name": "analysis_single", "params": {"model_latency_s": latency}, **single})
+
+    # Tiered routing: the fast stand-in answers first; only uncertain results pay for the strong one
+    tiered = app.get_tiered_model("fake", latency=latency)
+    routed = timed(lambda: [app.generate_interview_analysis(text, job_description, decision_levels, use_cache=False,
+                                                            model=tiered) for text in transcripts], repeat)
+    routed["per_candidate_s"] = routed["median_s"] / candidates
+    results.append({"name": "analysis_routed", "params": {"model_latency_s": latency, "candidates": candidates,
+                                                          "escalation_rate": app.model_router.routing_stats()[
+                                                              "escalation_rate"]}, **routed})
+
+    def threaded():
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda text: app.generate_interview_analysis(
+                text, job_description, decision_levels, use_cache=False, model=model), transcripts))
+
+    def pipelined():
+        app.run_async(app.analyze_candidates_async(transcripts, job_description, decision_levels,
+                                                   concurrency=workers, use_cache=False, model=model))
+
+    for name, func in (("batch_threads", threaded), ("batch_async", pipelined)):
+        stats = timed(func, repeat)
+        stats["candidates_per_s"] = candidates / stats["median_s"]
+        results.append({"name": name, "params": {"model_latency_s": latency, "candidates": candidates,
+                                                 "workers": workers}, **stats})
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    sizes = [10, 100] if args.quick else [10, 100, 1000]
+    analysis_sizes = [2000, 20000] if args.quick else [2000, 20000, 200000]
+    candidates = 8 if args.quick else 32
+
+    results = []
+    results += bench_extraction(sizes, args.repeat)
+    results += bench_prompt_building(sizes, args.repeat)
+    results += bench_parsing_and_rendering(analysis_sizes, args.repeat)
+    results += bench_compaction(args.repeat)
+    results += bench_end_to_end(args.latency, candidates, args.workers, max(1, args.repeat // 2))
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite against the fake model backend.")
+    parser.add_argument("--output", "-o", help="Write JSON results to this file instead of stdout.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case.")
+    parser.add_argument("--quick", action="store_true", help="Use smaller inputs for a fast smoke run.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per fake model call.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrency for the batch throughput cases.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        for result in report["results"]:
+            print(f"{result['name']:<28} {json.dumps(result['params']):<60} {result['median_s'] * 1000:10.2f} ms")
+    else:
+        print(output)
+    # Compaction that drops interview content is a correctness failure, not a slowdown
+    unfaithful = [result["params"]["fixture"] for result in report["results"]
+                  if result.get("missing") or result.get("leftover")]
+    if unfaithful:
+        print(f"Compaction fidelity check failed for: {', '.join(unfaithful)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Local stand-in for the Gemini model, for offline batch runs and benchmarks.
+
+Registered in app.py as the "fake" model backend (ANALYSIS_MODEL_BACKEND=fake).
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+
+class FakeAPIError(Exception):
+    """Injected failure; .code is the HTTP status, like google.api_core exceptions."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeUsage:
+    """Mimics response.usage_metadata, estimating about 4 characters per token."""
+
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(str(prompt)) // 4 + 1
+        self.candidates_token_count = len(text) // 4 + 1
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    """Mimics the parts of a Gemini response that the app reads."""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.parts = []
+        self.usage_metadata = usage_metadata
+
+
+class FakeTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class FakeGenerativeModel:
+    """Returns canned, deterministic analyses instead of calling the Gemini API.
+
+    latency is the simulated seconds per call; analysis_chars pads each analysis
+    to at least that many characters to simulate long reports. error_rate is the
+    fraction of calls that fail with a transient FakeAPIError (error_code, e.g. 429
+    or 503), drawn from a generator seeded with seed so runs are repeatable.
+    fail_first makes the first that many calls fail, e.g. to test retries.
+    """
+
+    def __init__(self, model_name="fake-model", latency=0.0, analysis_chars=0, error_rate=0.0, error_code=503,
+                 seed=0, fail_first=0):
+        self.model_name = model_name
+        self.latency = latency
+        self.analysis_chars = analysis_chars
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.fail_first = fail_first
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _start_call(self):
+        """Count the call and raise the injected error for the unlucky ones."""
+        with self._lock:
+            self.calls += 1
+            failed = self.calls <= self.fail_first or (self.error_rate and self._random.random() < self.error_rate)
+        if failed:
+            message = "Resource has been exhausted" if self.error_code == 429 else "The service is currently unavailable"
+            raise FakeAPIError(self.error_code, message)
+
+    def count_tokens(self, contents):
+        return FakeTokenCount(len(str(contents)) // 4 + 1)
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        self._start_call()
+        reply = self._reply(prompt, generation_config)
+        if stream:
+            return self._stream(prompt, reply)
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(reply, FakeUsage(prompt, reply))
+
+    def _stream(self, prompt, text, chunk_count=20):
+        """Yield the reply in roughly equal chunks, spreading the latency across them."""
+        size = max(1, len(text) // chunk_count + 1)
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / chunk_count)
+            # Like Gemini, only the final chunk carries the usage of the whole call
+            usage = FakeUsage(prompt, text) if start + size >= len(text) else None
+            yield FakeResponse(text[start:start + size], usage)
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        self._start_call()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        reply = self._reply(prompt, generation_config)
+        return FakeResponse(reply, FakeUsage(prompt, reply))
+
+    def _reply(self, prompt, generation_config=None):
+        # Named stand-ins (e.g. the fast and strong routing tiers) rate the same transcript independently
+        seeded = prompt if self.model_name == "fake-model" else f"{self.model_name}\n{prompt}"
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            return fake_analysis_json(seeded, self.analysis_chars)
+        if prompt.lstrip().startswith("Review the following interview analysis"):
+            return "The original assessment appears fair and consistent with the rating."
+        if prompt.startswith("You are condensing part"):
+            return fake_chunk_notes(prompt)
+        if prompt.startswith("Condense the following job description"):
+            return ("*   **Role:** Software Engineer\n*   **Must-Have Requirements:** Python, SQL\n"
+                    "*   **Nice-to-Have Requirements:** Cloud experience\n*   **Key Responsibilities:** Build services\n"
+                    "*   **Soft Skills:** Clear communication\n")
+        requested = re.search(r'^Write ONLY these sections[^:]*: (.+)\.$', prompt, re.MULTILINE)
+        if requested:
+            return fake_sections(seeded, self.analysis_chars, re.findall(r'(\d)\. ', requested.group(1)))
+        return fake_analysis(seeded, self.analysis_chars)
+
+
+# Build the canned sections a partial re-analysis asks for
+def fake_sections(prompt, analysis_chars, numbers):
+    """Return only the given sections (as digit strings) of the canned analysis."""
+    blocks = re.split(r'\n(?=\*\*\d\. )', fake_analysis(prompt, analysis_chars).strip())
+    return "\n\n".join(block.strip() for block in blocks if block.lstrip('*')[0] in numbers) + "\n"
+
+
+# Build the JSON-mode equivalent of fake_analysis
+def fake_analysis_json(prompt, analysis_chars=0):
+    """Return the canned analysis as a JSON document matching the app's response schema."""
+    text = fake_analysis(prompt, analysis_chars)
+    sections = []
+    for block in re.split(r'\n(?=\*\*\d\. )', text.strip()):
+        heading, _, content = block.partition('\n')
+        number, _, title = heading.strip('*').partition('. ')
+        sections.append({"number": int(number), "title": title, "content": content})
+    rating = int(re.search(r'Score: (\d)/5', text).group(1))
+    return json.dumps({
+        "sections": sections,
+        "overall_rating": rating,
+        "decision": re.search(r'Recommendation:\*\* (\w+)', text).group(1),
+        "confidence": "Medium",
+        "questions": [{"question": "Describe a recent project.", "answer": "A structured answer.", "quality": "Adequate"}],
+    })
+
+
+# Build canned notes for one chunk of a long transcript
+def fake_chunk_notes(prompt):
+    """Return short bullet notes echoing the first question found in the chunk."""
+    question = next((line.strip() for line in prompt.splitlines() if line.rstrip().endswith('?')), "Not found")
+    return f"""*   **Participants:** Interviewer, Candidate
+*   **Questions and Answers:** {question[:200]} The candidate answered adequately.
+*   **Skills Evidence:** Python, SQL
+*   **Communication Notes:** Clear.
+*   **Interview Flow:** Structured.
+"""
+
+
+# Build a canned 8-section analysis whose rating is derived from the prompt
+def fake_analysis(prompt, analysis_chars=0):
+    """Return a markdown analysis in the app's 8-section format, padded to analysis_chars."""
+    digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+    rating = digest % 5 + 1
+    if rating >= 4:
+        decision = "SELECT"
+    elif rating >= 3:
+        decision = "HOLD"
+    else:
+        decision = "REJECT"
+
+    text = f"""**1. Interview Overview**
+*   Candidate Name: Not Mentioned
+*   Position/Role Applied For: Not Mentioned
+*   Interview Type: Technical Screen
+*   Date/Time: Not Mentioned
+
+**2. Candidate Background Summary**
+*   Several years of relevant experience.
+*   Mentioned skills overlap with the job description.
+
+**3. Key Questions and Candidate Responses**
+*   Question: Describe a recent project. The candidate gave a structured answer.
+*   Number of technical questions: 3
+*   Number of good or adequate answers: {rating - 1 if rating > 1 else 0}
+
+**4. Job Description Alignment Analysis**
+*   Partial match against the key requirements.
+
+**5. Communication and Professionalism**
+*   Clear and concise communication.
+
+**6. Interviewer Performance (Brief)**
+*   Questions covered the main areas of the job description.
+
+**7. Overall Assessment**
+*   **Overall Rating (Score: {rating}/5):** Assessment generated by the local fake model.
+*   **Justification:** Deterministic placeholder text.
+
+**8. Final Decision Recommendation**
+*   **Recommendation:** {decision}
+*   **Supporting Points:**
+    *   Placeholder supporting point.
+*   **Confidence Level:** Medium
+"""
+
+    # Pad the alignment section with extra bullets to reach the requested size
+    padding, length = [], len(text)
+    while length < analysis_chars:
+        padding.append(f"*   Requirement {len(padding) + 1}: the candidate described relevant experience that partially matches.")
+        length += len(padding[-1]) + 1
+    if padding:
+        anchor = "*   Partial match against the key requirements."
+        text = text.replace(anchor, anchor + "\n" + "\n".join(padding))
+    return text
@@ -0,0 +1,238 @@
+"""Persistent SQLite-backed job queue with a pool of worker threads.
+
+Analyses are submitted as jobs and run by background workers, independently of
+the Streamlit session that submitted them. A job's status, partial output and
+final result live in the database, so the UI can poll and reattach by job ID
+after a rerun or a browser refresh. Server capacity is set by the worker count.
+
+Kept out of app.py because Streamlit re-executes the main script on every
+rerun; module state here (the queue and its workers) exists once per process.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Running jobs whose heartbeat is older than this are assumed orphaned (e.g. the server restarted)
+JOB_STALE_SECONDS = float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "120"))
+HEARTBEAT_SECONDS = 15
+# Partial output is written at most this often while a job streams
+PROGRESS_INTERVAL_SECONDS = 0.5
+# Finished jobs older than this are deleted when a queue is opened
+JOB_RETENTION_DAYS = float(os.getenv("ANALYSIS_JOB_RETENTION_DAYS", "7"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress_text TEXT NOT NULL DEFAULT '',
+    status_message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class JobQueue:
+    """A queue of jobs stored in one SQLite file; safe to share between threads and processes."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._workers = []
+        self._workers_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        connection.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                           (DONE, FAILED, time.time() - JOB_RETENTION_DAYS * 86400))
+
+    def _connection(self):
+        """Return this thread's connection (sqlite3 connections are not shared across threads)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            # WAL lets the UI read progress while a worker writes it
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def submit(self, payload, kind="analysis"):
+        """Queue a job with a JSON-serializable payload and return its ID."""
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), time.time()))
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict (without its payload), or None if it does not exist."""
+        row = self._connection().execute(
+            "SELECT id, kind, status, progress_text, status_message, result, error, created_at, started_at, "
+            "finished_at, (SELECT COUNT(*) FROM jobs AS ahead WHERE ahead.status = 'queued' "
+            "AND ahead.created_at < jobs.created_at) AS queue_position FROM jobs WHERE id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def list_jobs(self, status=None, limit=50):
+        """Return the most recent jobs, optionally only those with the given status."""
+        query = "SELECT id, kind, status, status_message, error, created_at, started_at, finished_at FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        rows = self._connection().execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,))
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        """Return the number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status")
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def _claim(self, worker):
+        """Atomically move the oldest queued job to running; returns (job_id, payload) or None."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT id, payload FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                                     (QUEUED,)).fetchone()
+            if row is not None:
+                now = time.time()
+                connection.execute("UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? "
+                                   "WHERE id = ?", (RUNNING, worker, now, now, row["id"]))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return (row["id"], json.loads(row["payload"])) if row is not None else None
+
+    def report_progress(self, job_id, progress_text=None, status_message=None):
+        """Store partial output and/or a status line for a running job."""
+        assignments, params = ["heartbeat_at = ?"], [time.time()]
+        if progress_text is not None:
+            assignments.append("progress_text = ?")
+            params.append(progress_text)
+        if status_message is not None:
+            assignments.append("status_message = ?")
+            params.append(status_message)
+        self._connection().execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ? AND status = ?",
+                                   params + [job_id, RUNNING])
+
+    def _finish(self, job_id, result=None, error=None):
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, heartbeat_at = ? WHERE id = ?",
+            (FAILED if error else DONE, json.dumps(result) if result is not None else None, error,
+             time.time(), time.time(), job_id))
+
+    def requeue_stale(self):
+        """Put running jobs whose worker stopped heartbeating back in the queue."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL WHERE status = ? AND heartbeat_at < ?",
+            (QUEUED, RUNNING, time.time() - JOB_STALE_SECONDS))
+        if cursor.rowcount:
+            self._wakeup.set()
+        return cursor.rowcount
+
+    def start_workers(self, handler, count):
+        """Start worker threads (once per queue) that run handler(job_id, payload, progress) for each job.
+
+        progress(text=None, message=None) records partial output, throttled to one write
+        per PROGRESS_INTERVAL_SECONDS unless a status message is passed. The handler's
+        return value is stored as the job result; an exception fails the job.
+        """
+        # Concurrent first callers (several sessions or API requests) must not each start a pool
+        with self._workers_lock:
+            if self._workers:
+                return
+            prefix = f"{socket.gethostname()}:{os.getpid()}"
+            for index in range(count):
+                worker = threading.Thread(target=self._work, args=(handler, f"{prefix}:{index}"),
+                                          name=f"analysis-job-worker-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            threading.Thread(target=self._heartbeat, name="analysis-job-heartbeat", daemon=True).start()
+
+    def _work(self, handler, worker):
+        while True:
+            try:
+                claimed = self._claim(worker)
+            except sqlite3.Error:
+                claimed = None
+            if claimed is None:
+                # Also poll, since jobs may be submitted by another process sharing the database
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+
+            job_id, payload = claimed
+            with self._running_lock:
+                self._running.add(job_id)
+            last_write = [0.0]
+
+            def progress(text=None, message=None):
+                now = time.monotonic()
+                if message is None and now - last_write[0] < PROGRESS_INTERVAL_SECONDS:
+                    return
+                last_write[0] = now
+                self.report_progress(job_id, text, message)
+
+            try:
+                result = handler(job_id, payload, progress)
+                self._finish(job_id, result=result)
+            except Exception as e:
+                self._finish(job_id, error=str(e) or type(e).__name__)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
+
+    def _heartbeat(self):
+        """Keep this process's running jobs fresh and recover jobs orphaned by dead workers."""
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                connection = self._connection()
+                for job_id in running:
+                    connection.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+                self.requeue_stale()
+            except sqlite3.Error:
+                continue
+
+
+def get_queue(db_path):
+    """Return the process-wide JobQueue for db_path, opening it on first use."""
+    key = os.path.abspath(db_path)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = JobQueue(db_path)
+            queue.requeue_stale()
+        return queue
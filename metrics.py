@@ -0,0 +1,266 @@
+"""Per-stage latency, token and cost instrumentation.
+
+An analysis "run" groups the timed stages (extraction, main generation, bias
+review, export, ...) of one request. The active run is tracked in a context
+variable, so threads and asyncio tasks working on different candidates never
+mix their measurements. Every finished run is logged as one JSON line and
+folded into process-wide aggregates, exposed as percentiles (snapshot) and as
+Prometheus text (prometheus_text / METRICS_PROM_FILE).
+
+Kept free of Streamlit imports so the batch runner and API server can use it.
+"""
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+
+# USD per million (prompt, response) tokens; unknown models are reported with zero cost
+MODEL_PRICES_PER_MILLION = {
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+    'gemini-2.5-pro': (1.25, 10.00),
+}
+
+# Samples kept per stage for percentiles, and finished runs kept for the diagnostics view
+SAMPLE_WINDOW = int(os.getenv("METRICS_SAMPLE_WINDOW", "1000"))
+RECENT_RUNS = int(os.getenv("METRICS_RECENT_RUNS", "50"))
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Optional outputs: JSON lines log of every run, and a Prometheus text file rewritten after each run
+METRICS_LOG_FILE = os.getenv("METRICS_LOG_FILE")
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE")
+
+logger = logging.getLogger("transcript_analyzer.metrics")
+if METRICS_LOG_FILE:
+    _handler = logging.FileHandler(METRICS_LOG_FILE, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_current_run = contextvars.ContextVar("analysis_metrics_run", default=None)
+_lock = threading.Lock()
+_stage_samples = collections.defaultdict(lambda: collections.deque(maxlen=SAMPLE_WINDOW))
+_run_samples = collections.defaultdict(lambda: collections.deque(maxlen=SAMPLE_WINDOW))
+_stage_totals = collections.defaultdict(lambda: {"count": 0, "seconds": 0.0, "prompt_tokens": 0,
+                                                  "response_tokens": 0, "cost_usd": 0.0})
+_counters = collections.Counter()
+_recent_runs = collections.deque(maxlen=RECENT_RUNS)
+
+
+class Stage:
+    """One timed stage of a run, filled in by the stage() context manager."""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cost_usd = 0.0
+        self.model = None
+        self.error = None
+
+    def record_usage(self, response, model_name=None):
+        """Add the token counts from a response's usage_metadata, if it has any."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        response_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        self.prompt_tokens += prompt_tokens
+        self.response_tokens += response_tokens
+        if model_name:
+            self.model = model_name.split('/')[-1]
+            input_price, output_price = MODEL_PRICES_PER_MILLION.get(self.model, (0.0, 0.0))
+            self.cost_usd += (prompt_tokens * input_price + response_tokens * output_price) / 1_000_000
+
+    def as_dict(self):
+        record = {"stage": self.name, "seconds": round(self.seconds, 6)}
+        if self.prompt_tokens or self.response_tokens:
+            record.update(prompt_tokens=self.prompt_tokens, response_tokens=self.response_tokens,
+                          cost_usd=round(self.cost_usd, 8), model=self.model)
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+def current_run():
+    """Return the run record active in this context, or None."""
+    return _current_run.get()
+
+
+@contextlib.contextmanager
+def run(kind="analysis", **fields):
+    """Group the stages timed inside the block into one run record.
+
+    Nested calls join the run that is already active, so main() and
+    generate_interview_analysis can both open one without double counting.
+    """
+    active = _current_run.get()
+    if active is not None:
+        yield active
+        return
+
+    record = {"run_id": uuid.uuid4().hex[:12], "kind": kind, "started_at": time.time(),
+              "stages": [], "events": collections.Counter(), **fields}
+    token = _current_run.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _current_run.reset(token)
+        record["seconds"] = round(time.perf_counter() - started, 6)
+        _finish_run(record)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as a named stage of the active run (or only in the aggregates if none)."""
+    record = Stage(name)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.seconds = time.perf_counter() - started
+        _record_stage(record)
+
+
+def count(event, amount=1):
+    """Count an event (cache hit, retry, ...) for the active run and the process totals."""
+    with _lock:
+        _counters[event] += amount
+        active = _current_run.get()
+        if active is not None:
+            active["events"][event] += amount
+
+
+def _record_stage(record):
+    with _lock:
+        _stage_samples[record.name].append(record.seconds)
+        totals = _stage_totals[record.name]
+        totals["count"] += 1
+        totals["seconds"] += record.seconds
+        totals["prompt_tokens"] += record.prompt_tokens
+        totals["response_tokens"] += record.response_tokens
+        totals["cost_usd"] += record.cost_usd
+        active = _current_run.get()
+        if active is not None:
+            active["stages"].append(record.as_dict())
+
+
+def _finish_run(record):
+    stages = record["stages"]
+    record["events"] = dict(record["events"])
+    record["prompt_tokens"] = sum(s.get("prompt_tokens", 0) for s in stages)
+    record["response_tokens"] = sum(s.get("response_tokens", 0) for s in stages)
+    record["cost_usd"] = round(sum(s.get("cost_usd", 0.0) for s in stages), 8)
+    with _lock:
+        _run_samples[record["kind"]].append(record["seconds"])
+        _recent_runs.append(record)
+    logger.info(json.dumps(record, default=str))
+    if METRICS_PROM_FILE:
+        write_prometheus(METRICS_PROM_FILE)
+
+
+def _percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_samples[max(0, math.ceil(fraction * len(sorted_samples)) - 1)]
+
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    summary = {"count": len(ordered), "mean": sum(ordered) / len(ordered), "max": ordered[-1]}
+    for fraction in PERCENTILES:
+        summary[f"p{fraction * 100:g}"] = _percentile(ordered, fraction)
+    return summary
+
+
+def snapshot():
+    """Return aggregate percentiles (seconds), token and cost totals per stage and per run kind."""
+    with _lock:
+        stage_samples = {name: list(samples) for name, samples in _stage_samples.items() if samples}
+        run_samples = {kind: list(samples) for kind, samples in _run_samples.items() if samples}
+        totals = {name: dict(values) for name, values in _stage_totals.items()}
+        counters = dict(_counters)
+    stages = {}
+    for name, samples in stage_samples.items():
+        stages[name] = {**_summarize(samples), **{key: value for key, value in totals[name].items()
+                                                   if key not in ("count", "seconds")}}
+    return {
+        "stages": stages,
+        "runs": {kind: _summarize(samples) for kind, samples in run_samples.items()},
+        "counters": counters,
+    }
+
+
+def recent_runs(limit=None):
+    """Return the most recent finished run records, newest first."""
+    with _lock:
+        runs = list(_recent_runs)[::-1]
+    return runs[:limit] if limit else runs
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Render the aggregates in the Prometheus text exposition format."""
+    with _lock:
+        stage_samples = {name: sorted(samples) for name, samples in _stage_samples.items() if samples}
+        run_samples = {kind: sorted(samples) for kind, samples in _run_samples.items() if samples}
+        totals = {name: dict(values) for name, values in _stage_totals.items()}
+        counters = dict(_counters)
+
+    lines = ["# HELP analysis_stage_seconds Wall time per analysis stage (recent window quantiles).",
+             "# TYPE analysis_stage_seconds summary"]
+    for name, samples in sorted(stage_samples.items()):
+        for fraction in PERCENTILES:
+            lines.append(f'analysis_stage_seconds{{stage="{_label(name)}",quantile="{fraction:g}"}} '
+                         f'{_percentile(samples, fraction):.6f}')
+        lines.append(f'analysis_stage_seconds_sum{{stage="{_label(name)}"}} {totals[name]["seconds"]:.6f}')
+        lines.append(f'analysis_stage_seconds_count{{stage="{_label(name)}"}} {totals[name]["count"]}')
+
+    lines += ["# HELP analysis_run_seconds Wall time per run (recent window quantiles).",
+              "# TYPE analysis_run_seconds summary"]
+    for kind, samples in sorted(run_samples.items()):
+        for fraction in PERCENTILES:
+            lines.append(f'analysis_run_seconds{{kind="{_label(kind)}",quantile="{fraction:g}"}} '
+                         f'{_percentile(samples, fraction):.6f}')
+
+    lines += ["# HELP analysis_tokens_total Model tokens used per stage.", "# TYPE analysis_tokens_total counter"]
+    for name, values in sorted(totals.items()):
+        for direction in ("prompt", "response"):
+            if values[f"{direction}_tokens"]:
+                lines.append(f'analysis_tokens_total{{stage="{_label(name)}",direction="{direction}"}} '
+                             f'{values[f"{direction}_tokens"]}')
+
+    lines += ["# HELP analysis_cost_usd_total Estimated model cost per stage.", "# TYPE analysis_cost_usd_total counter"]
+    for name, values in sorted(totals.items()):
+        if values["cost_usd"]:
+            lines.append(f'analysis_cost_usd_total{{stage="{_label(name)}"}} {values["cost_usd"]:.8f}')
+
+    lines += ["# HELP analysis_events_total Cache hits, retries and other counted events.",
+              "# TYPE analysis_events_total counter"]
+    for event, value in sorted(counters.items()):
+        lines.append(f'analysis_events_total{{event="{_label(event)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically write prometheus_text() to path (for a node_exporter textfile collector)."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("Could not write Prometheus metrics to %s", path)
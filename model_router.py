@@ -0,0 +1,87 @@
+"""Tiered model routing: a fast model first, a stronger one only when the result is uncertain.
+
+TieredModel pairs two models from app.get_model_backend(). The app runs the
+main analysis on the fast tier, checks the result (app.escalation_reasons) and
+repeats the call on the strong tier only if it is uncertain. Auxiliary calls
+(chunk notes, job description profile, bias review) stay on the fast tier.
+
+Every routing decision is added to the active metrics run, counted, kept in a
+process-wide log for routing_stats(), and appended to ROUTING_LOG_FILE if set.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# Optional JSON lines file receiving every routing decision
+ROUTING_LOG_FILE = os.getenv("ROUTING_LOG_FILE")
+# Decisions kept in memory for routing_stats() and the diagnostics view
+RECENT_DECISIONS = int(os.getenv("ROUTING_RECENT_DECISIONS", "500"))
+
+_lock = threading.Lock()
+_decisions = collections.deque(maxlen=RECENT_DECISIONS)
+_totals = {"routed": 0, "escalated": 0}
+_reasons = collections.Counter()
+
+
+class TieredModel:
+    """A fast and a strong model behind one model-like object.
+
+    generate_content, generate_content_async and count_tokens go to the fast tier;
+    model_name names both tiers so cached results never mix routed and single-model runs.
+    """
+
+    def __init__(self, fast, strong):
+        self.fast = fast
+        self.strong = strong
+        self.model_name = f"{getattr(fast, 'model_name', 'fast')}>{getattr(strong, 'model_name', 'strong')}"
+
+    def generate_content(self, contents, **options):
+        return self.fast.generate_content(contents, **options)
+
+    async def generate_content_async(self, contents, **options):
+        return await self.fast.generate_content_async(contents, **options)
+
+    def count_tokens(self, contents):
+        return self.fast.count_tokens(contents)
+
+
+def record_decision(model, reasons):
+    """Record whether a first-pass result from model.fast was escalated to model.strong, and why."""
+    decision = {
+        "at": time.time(),
+        "fast_model": model.fast.model_name,
+        "strong_model": model.strong.model_name,
+        "escalated": bool(reasons),
+        "reasons": list(reasons),
+        "final_model": (model.strong if reasons else model.fast).model_name,
+    }
+    with _lock:
+        _decisions.append(decision)
+        _totals["routed"] += 1
+        _totals["escalated"] += bool(reasons)
+        _reasons.update(reasons)
+        if ROUTING_LOG_FILE:
+            with open(ROUTING_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(decision) + "\n")
+    metrics.count("routing escalations" if reasons else "routing fast pass accepted")
+    active = metrics.current_run()
+    if active is not None:
+        active["routing"] = decision
+    return decision
+
+
+def routing_stats():
+    """Return how many analyses were routed, how many escalated, the escalation rate and reasons."""
+    with _lock:
+        stats = dict(_totals, reasons=dict(_reasons))
+    stats["escalation_rate"] = stats["escalated"] / stats["routed"] if stats["routed"] else 0.0
+    return stats
+
+
+def recent_decisions():
+    with _lock:
+        return list(_decisions)
@@ -0,0 +1,307 @@
+"""Resilient wrapper around model generation calls.
+
+ResilientModel wraps any model from app.get_model_backend() and adds, for
+every generate_content / generate_content_async call:
+
+- a shared token-bucket rate limiter sized to the provider quota,
+- retries of transient errors (429/5xx, timeouts) with jittered exponential backoff,
+- a circuit breaker that fails fast after repeated transient errors,
+- single-flight deduplication: identical concurrent requests share one call.
+
+Limiters, breakers and in-flight calls are process-wide, so every Streamlit
+session, batch worker and API request draws from the same quota.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import random
+import threading
+import time
+
+import metrics
+
+# Retry settings for transient errors
+MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "1.0"))
+RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "30"))
+
+# Circuit breaker: open after this many consecutive transient failures, probe again after the reset time
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("MODEL_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("MODEL_CIRCUIT_RESET_SECONDS", "30"))
+
+# Requests the rate limiter lets through back to back before spacing them out
+RATE_LIMIT_BURST = float(os.getenv("MODEL_RATE_BURST", "5"))
+
+# HTTP status codes (google.api_core exceptions carry them as .code) worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                         "DeadlineExceeded", "GatewayTimeout"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open."""
+
+
+def is_transient(error):
+    """Return True for rate-limit, overload and timeout errors that are worth retrying."""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    if type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token-bucket limiter: `per_minute` calls per minute on average, bursts up to `burst`.
+
+    A call that finds the bucket empty reserves a future token and waits for it,
+    so waiting callers are served in arrival order. per_minute=0 disables the limit.
+    """
+
+    def __init__(self, per_minute, burst=RATE_LIMIT_BURST):
+        self.lock = threading.Lock()
+        self.set_rate(per_minute, burst)
+
+    def set_rate(self, per_minute, burst=RATE_LIMIT_BURST):
+        with self.lock:
+            self.rate = (per_minute or 0) / 60.0
+            self.capacity = max(1.0, burst)
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it."""
+        with self.lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay:
+            metrics.count("rate limited calls")
+        return delay
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive transient failures.
+
+    While open, calls fail immediately with CircuitOpenError. After `reset_seconds`
+    a single probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.probing:
+                metrics.count("circuit breaker rejections")
+                raise CircuitOpenError(f"Model service unavailable after repeated errors; "
+                                       f"retrying in {max(1, int(remaining))}s.")
+            self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    metrics.count("circuit breaker opened")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+class SingleFlight:
+    """Lets identical concurrent calls share the result of the first one."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = concurrent.futures.Future()
+        if not leader:
+            metrics.count("coalesced calls")
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key, func):
+        loop = asyncio.get_running_loop()
+        # asyncio futures cannot be awaited from another loop, so calls are shared per loop
+        key = (id(loop), key)
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = loop.create_future()
+        if not leader:
+            metrics.count("coalesced calls")
+            return await asyncio.shield(future)
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+        future.set_result(result)
+        return result
+
+
+_registry_lock = threading.Lock()
+_limiters = {}
+_breakers = {}
+_single_flight = SingleFlight()
+
+
+def get_limiter(name, per_minute=0):
+    """Return the process-wide limiter called name, creating it with per_minute on first use."""
+    with _registry_lock:
+        if name not in _limiters:
+            _limiters[name] = TokenBucket(per_minute)
+        return _limiters[name]
+
+
+def get_breaker(name):
+    """Return the process-wide circuit breaker called name."""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker()
+        return _breakers[name]
+
+
+def _request_key(model_name, contents, options):
+    return hashlib.sha256(repr((model_name, contents, sorted(options.items()))).encode('utf-8')).hexdigest()
+
+
+class ResilientModel:
+    """Wraps a model with rate limiting, retries, a circuit breaker and request coalescing.
+
+    Exposes the same generate_content / generate_content_async surface as the wrapped
+    model. Other attributes, including count_tokens (whose failures the app already
+    tolerates), are passed through untouched.
+    """
+
+    def __init__(self, wrapped, limiter=None, breaker=None, max_retries=MAX_RETRIES):
+        self.wrapped = wrapped
+        self.model_name = getattr(wrapped, 'model_name', None)
+        self.limiter = limiter or TokenBucket(0)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def _call(self, func):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.limiter.wait()
+            try:
+                result = func()
+            except Exception as e:
+                if not is_transient(e):
+                    # The service answered (e.g. a bad request); that says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                metrics.count("retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _call_async(self, func):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            await self.limiter.wait_async()
+            try:
+                result = await func()
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                metrics.count("retries")
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+    def generate_content(self, contents, stream=False, **options):
+        if stream:
+            # Only the initial request is retried; a stream that fails midway surfaces the error
+            return self._call(lambda: self.wrapped.generate_content(contents, stream=True, **options))
+        key = _request_key(self.model_name, contents, options)
+        return _single_flight.do(key, lambda: self._call(lambda: self.wrapped.generate_content(contents, **options)))
+
+    async def generate_content_async(self, contents, **options):
+        key = _request_key(self.model_name, contents, options)
+        return await _single_flight.do_async(
+            key, lambda: self._call_async(lambda: self.wrapped.generate_content_async(contents, **options)))
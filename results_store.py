@@ -0,0 +1,158 @@
+"""Persistent SQLite store of finished analyses, indexed for ranking candidates per requisition.
+
+Each row is one candidate analyzed against one job description. The
+rating, decision and confidence are parsed once at save time into indexed
+columns, so filtering and sorting hundreds of candidates needs no model
+calls and no re-parsing. Re-analyzing the same transcript against the same
+job description updates its row instead of adding a duplicate.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    requisition TEXT NOT NULL,
+    jd_hash TEXT NOT NULL,
+    transcript_hash TEXT NOT NULL,
+    candidate_name TEXT,
+    file_name TEXT,
+    overall_rating REAL NOT NULL DEFAULT 0,
+    decision TEXT,
+    confidence TEXT,
+    bias_review INTEGER NOT NULL DEFAULT 0,
+    analysis TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (jd_hash, transcript_hash)
+);
+CREATE INDEX IF NOT EXISTS results_jd_rating ON results (jd_hash, overall_rating DESC, updated_at DESC);
+CREATE INDEX IF NOT EXISTS results_requisition_rating ON results (requisition, overall_rating DESC);
+CREATE INDEX IF NOT EXISTS results_jd_decision ON results (jd_hash, decision, overall_rating DESC);
+CREATE INDEX IF NOT EXISTS results_decision_rating ON results (decision, overall_rating DESC);
+"""
+
+# Columns returned by listing queries; the full analysis and parsed JSON are only loaded by get()
+SUMMARY_COLUMNS = ("id, requisition, jd_hash, candidate_name, file_name, overall_rating, decision, confidence, "
+                   "bias_review, created_at, updated_at")
+
+SORT_ORDERS = {
+    "rating": "overall_rating DESC, updated_at DESC",
+    "newest": "updated_at DESC",
+    "name": "COALESCE(candidate_name, file_name) COLLATE NOCASE, overall_rating DESC",
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ResultsStore:
+    """Analysis results in one SQLite file; safe to share between threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, record):
+        """Insert or update the result for (jd_hash, transcript_hash); returns its row ID."""
+        now = time.time()
+        values = dict(record, parsed=json.dumps(record["parsed"]), bias_review=int(bool(record.get("bias_review"))),
+                      created_at=now, updated_at=now)
+        connection = self._connection()
+        connection.execute(
+            """INSERT INTO results (requisition, jd_hash, transcript_hash, candidate_name, file_name, overall_rating,
+                                    decision, confidence, bias_review, analysis, parsed, created_at, updated_at)
+               VALUES (:requisition, :jd_hash, :transcript_hash, :candidate_name, :file_name, :overall_rating,
+                       :decision, :confidence, :bias_review, :analysis, :parsed, :created_at, :updated_at)
+               ON CONFLICT (jd_hash, transcript_hash) DO UPDATE SET
+                   requisition = excluded.requisition,
+                   candidate_name = COALESCE(excluded.candidate_name, results.candidate_name),
+                   file_name = COALESCE(excluded.file_name, results.file_name),
+                   overall_rating = excluded.overall_rating, decision = excluded.decision,
+                   confidence = excluded.confidence, bias_review = excluded.bias_review,
+                   analysis = excluded.analysis, parsed = excluded.parsed, updated_at = excluded.updated_at""",
+            {key: values.get(key) for key in ("requisition", "jd_hash", "transcript_hash", "candidate_name",
+                                              "file_name", "overall_rating", "decision", "confidence",
+                                              "bias_review", "analysis", "parsed", "created_at", "updated_at")},
+        )
+        return connection.execute("SELECT id FROM results WHERE jd_hash = ? AND transcript_hash = ?",
+                                  (record["jd_hash"], record["transcript_hash"])).fetchone()["id"]
+
+    def get(self, result_id):
+        """Return one stored result with its full analysis text and parsed structure, or None."""
+        row = self._connection().execute("SELECT * FROM results WHERE id = ?", (result_id,)).fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        result["parsed"] = json.loads(result["parsed"])
+        return result
+
+    def requisitions(self):
+        """Return one summary per job description: title, candidate count, decision counts and last update."""
+        rows = self._connection().execute(
+            """SELECT jd_hash, MAX(requisition) AS requisition, COUNT(*) AS candidates,
+                      AVG(overall_rating) AS average_rating, MAX(overall_rating) AS best_rating,
+                      SUM(decision = 'SELECT') AS selected, SUM(decision = 'HOLD') AS held,
+                      SUM(decision = 'REJECT') AS rejected, MAX(updated_at) AS updated_at
+               FROM results GROUP BY jd_hash ORDER BY updated_at DESC""")
+        return [dict(row) for row in rows]
+
+    def rank(self, jd_hash=None, requisition=None, decisions=None, min_rating=None, search=None,
+             order="rating", limit=500, offset=0):
+        """Return candidate summaries for one job description (or requisition), best first.
+
+        decisions limits to the given decision levels (an empty list matches nothing), min_rating to ratings at or above it,
+        and search to candidate or file names containing the text.
+        """
+        if decisions is not None and not decisions:
+            return []
+        clauses, params = [], []
+        if jd_hash:
+            clauses.append("jd_hash = ?")
+            params.append(jd_hash)
+        if requisition:
+            clauses.append("requisition = ?")
+            params.append(requisition)
+        if decisions is not None:
+            clauses.append(f"decision IN ({', '.join('?' * len(decisions))})")
+            params.extend(decisions)
+        if min_rating:
+            clauses.append("overall_rating >= ?")
+            params.append(min_rating)
+        if search:
+            clauses.append("(candidate_name LIKE ? OR file_name LIKE ?)")
+            params.extend([f"%{search}%"] * 2)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM results{where} ORDER BY {SORT_ORDERS[order]} LIMIT ? OFFSET ?",
+            params + [limit, offset])
+        return [dict(row) for row in rows]
+
+    def delete(self, result_id):
+        self._connection().execute("DELETE FROM results WHERE id = ?", (result_id,))
+
+
+def get_store(db_path):
+    """Return the process-wide ResultsStore for db_path, opening it on first use."""
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ResultsStore(db_path)
+        return store
@@ -0,0 +1,122 @@
+import pytest
+
+import app
+
+LEVELS = app.get_decision_levels()
+
+REPORT = """**1. Interview Overview**
+*   Candidate Name: Ann Lee
+*   Position/Role Applied For: Backend Engineer
+
+**2. Candidate Background Summary**
+*   Six years of Python and PostgreSQL.
+
+**3. Key Questions and Candidate Responses**
+*   Question: How do you tune a slow query?
+*   Answer: Reads the plan, adds a covering index.
+*   Quality: Good
+
+**4. Job Description Alignment Analysis**
+*   Strong match on the key requirements.
+
+**5. Communication and Professionalism**
+*   Clear and concise.
+
+**6. Interviewer Performance (Brief)**
+*   Covered the main areas.
+
+**7. Overall Assessment**
+*   **Overall Rating (Score: {rating}/5):** Solid candidate.
+*   **Justification:** Good depth on databases.
+
+**8. Final Decision Recommendation**
+*   **Recommendation:** {decision}
+*   **Confidence Level:** {confidence}
+"""
+
+
+def report(rating="4", decision="SELECT", confidence="High"):
+    return REPORT.format(rating=rating, decision=decision, confidence=confidence)
+
+
+def test_parse_analysis_indexes_sections_and_fields():
+    parsed = app.parse_analysis(report() + "\n## Bias Check\nNo bias found.", LEVELS)
+    assert [section["number"] for section in parsed["sections"]] == list(range(1, 9))
+    assert parsed["sections"][6]["title"] == "Overall Assessment"
+    assert (parsed["overall_rating"], parsed["decision"], parsed["confidence"]) == (4.0, "SELECT", "High")
+    assert parsed["questions"][0]["question"] == "How do you tune a slow query?"
+    assert parsed["bias_check"] == "No bias found."
+    assert app.extract_overview_field(parsed, "Candidate Name") == "Ann Lee"
+
+
+@pytest.mark.parametrize("rating", ["5.5", "0.5", "6"])
+def test_parse_analysis_ignores_out_of_range_ratings(rating):
+    assert app.parse_analysis(report(rating=rating), LEVELS)["overall_rating"] == 0
+
+
+def test_parse_analysis_falls_back_to_a_number_in_section_7():
+    text = report().replace("*   **Overall Rating (Score: 4/5):** Solid candidate.", "*   Rated 3.5 by the panel.")
+    assert app.parse_analysis(text, LEVELS)["overall_rating"] == 3.5
+
+
+def test_parse_analysis_without_recommendation_leaves_decision_empty():
+    parsed = app.parse_analysis(report().replace("*   **Recommendation:** SELECT\n", ""), LEVELS)
+    assert parsed["decision"] is None
+    assert app.extract_decision_level("", LEVELS, parsed)["level"] == "SELECT"
+
+
+def test_consistent_analysis_needs_no_review():
+    assert app.check_analysis_consistency(app.parse_analysis(report(), LEVELS), LEVELS) == []
+
+
+@pytest.mark.parametrize("rating, decision, consistent", [
+    ("4", "REJECT", False),
+    ("2", "SELECT", False),
+    ("2", "REJECT", True),
+    ("3.5", "SELECT", True),
+    ("3.5", "HOLD", True),
+    ("3.5", "REJECT", False),
+])
+def test_consistency_check_compares_decision_with_rating(rating, decision, consistent):
+    reasons = app.check_analysis_consistency(app.parse_analysis(report(rating, decision), LEVELS), LEVELS)
+    assert (reasons == []) is consistent
+
+
+def test_consistency_check_handles_out_of_range_ratings():
+    parsed = {"overall_rating": 5.5, "decision": "SELECT", "confidence": "High"}
+    assert app.check_analysis_consistency(parsed, LEVELS) == ["Overall rating could not be extracted."]
+
+
+def test_consistency_check_flags_missing_fields_and_low_confidence():
+    parsed = {"overall_rating": 0, "decision": None, "confidence": "Low"}
+    assert app.check_analysis_consistency(parsed, LEVELS) == [
+        "Overall rating could not be extracted.", "Final decision could not be extracted.",
+        "Model reported low confidence."]
+
+
+@pytest.mark.parametrize("mode, text, expected", [
+    ("auto", report(), False),
+    ("auto", report("4", "REJECT"), True),
+    ("always", report(), True),
+    ("never", report("4", "REJECT"), False),
+    ("auto", "Error: the model is unavailable.", False),
+])
+def test_needs_review(monkeypatch, mode, text, expected):
+    monkeypatch.setattr(app, "BIAS_REVIEW_MODE", mode)
+    before = app.get_review_stats()
+    run_review, _ = app._needs_review(text, None, LEVELS)
+    assert run_review is expected
+    after = app.get_review_stats()
+    assert after["run" if expected else "skipped"] == before["run" if expected else "skipped"] + 1
+
+
+def test_json_mode_does_not_reuse_markdown_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "CACHE_DIR", str(tmp_path))
+    model = app.get_model_backend("fake")
+    transcript = "Interviewer: How do you tune a slow query?\nCandidate: I read the plan and add an index."
+    app.generate_interview_analysis(transcript, "Python developer", LEVELS, model=model, output_mode="markdown")
+    calls_before = model.wrapped.calls
+    result = app.generate_interview_analysis(transcript, "Python developer", LEVELS, model=model, output_mode="json")
+    assert result["parsed"]["source"] == "json"
+    assert result["reused_sections"] == []
+    assert model.wrapped.calls > calls_before
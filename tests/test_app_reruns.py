@@ -0,0 +1,25 @@
+import os
+
+import google.generativeai as genai
+from streamlit.testing.v1 import AppTest
+
+import app_state
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def test_reruns_reuse_process_wide_state(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(app_state, "gemini_configured", False)
+    configure_calls = []
+    monkeypatch.setattr(genai, "configure", lambda **options: configure_calls.append(options))
+    reruns_before = len(app_state.rerun_timings)
+
+    script = AppTest.from_file(APP_PATH, default_timeout=30)
+    for _ in range(3):
+        script.run()
+        assert not script.exception
+
+    # Streamlit re-executes app.py each time; the client is still configured only once
+    assert len(configure_calls) == 1
+    assert len(app_state.rerun_timings) == reruns_before + 3
@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+
+import app
+import app_state
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(app_state, "cache_size_bytes", None)
+    monkeypatch.setattr(app_state, "cache_scanned_at", 0.0)
+    monkeypatch.setattr(app_state, "cache_evicting", False)
+    return tmp_path
+
+
+def wait_for_eviction():
+    deadline = time.monotonic() + 5
+    while app_state.cache_evicting:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def cache_files(directory):
+    return [os.path.join(root, name) for root, _dirs, files in os.walk(directory) for name in files]
+
+
+def test_round_trip(cache_dir):
+    app.cache_put("analysis", "ab12", {"analysis": "text"})
+    assert app.cache_get("analysis", "ab12") == {"analysis": "text"}
+    assert app.cache_get("analysis", "cd34") is None
+
+
+def test_writes_do_not_scan_the_directory_once_the_size_is_known(cache_dir, monkeypatch):
+    app.cache_put("analysis", app.make_cache_key(0), {"value": 0})
+    wait_for_eviction()
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(app.os, "walk", lambda *args: walks.append(args) or real_walk(*args))
+    for n in range(1, 50):
+        app.cache_put("analysis", app.make_cache_key(n), {"value": n})
+    wait_for_eviction()
+    assert walks == []
+    assert app_state.cache_size_bytes == sum(os.path.getsize(path) for path in cache_files(cache_dir))
+
+
+def test_passing_the_size_limit_evicts_least_recently_used_entries(cache_dir, monkeypatch):
+    monkeypatch.setattr(app, "CACHE_MAX_BYTES", 2000)
+    now = time.time()
+    for n in range(40):
+        app.cache_put("analysis", app.make_cache_key(n), {"value": "x" * 80})
+        wait_for_eviction()
+        # Distinct modification times so least recently used is well defined
+        os.utime(app._cache_path("analysis", app.make_cache_key(n)), (now, now - 100 + n))
+    app.cache_put("analysis", app.make_cache_key("last"), {"value": "x" * 80})
+    wait_for_eviction()
+    assert sum(os.path.getsize(path) for path in cache_files(cache_dir)) <= 2000
+    assert app.cache_get("analysis", app.make_cache_key("last")) is not None
+    assert app.cache_get("analysis", app.make_cache_key(39)) is not None
+    assert app.cache_get("analysis", app.make_cache_key(0)) is None
+    assert app.get_cache_stats()["analysis"]["evictions"] > 0
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import job_queue
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (job_queue.DONE, job_queue.FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_worker_runs_job_and_stores_result(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    queue.start_workers(lambda job_id, payload, progress: {"doubled": payload["n"] * 2}, 2)
+    job = wait_for(queue, queue.submit({"n": 21}))
+    assert job["status"] == job_queue.DONE
+    assert job["result"] == {"doubled": 42}
+
+
+def test_handler_exception_fails_job(tmp_path):
+    def handler(job_id, payload, progress):
+        raise RuntimeError("model unavailable")
+
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    queue.start_workers(handler, 1)
+    job = wait_for(queue, queue.submit({}))
+    assert job["status"] == job_queue.FAILED
+    assert job["error"] == "model unavailable"
+
+
+def test_each_job_is_claimed_once(tmp_path):
+    handled = []
+    lock = threading.Lock()
+
+    def handler(job_id, payload, progress):
+        with lock:
+            handled.append(payload["n"])
+
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    job_ids = [queue.submit({"n": n}) for n in range(30)]
+    queue.start_workers(handler, 4)
+    for job_id in job_ids:
+        wait_for(queue, job_id)
+    assert sorted(handled) == list(range(30))
+    assert queue.counts() == {job_queue.DONE: 30}
+
+
+def test_concurrent_start_workers_starts_one_pool(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        queue.start_workers(lambda job_id, payload, progress: None, 4)
+
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(queue._workers) == 4
+
+
+def test_requeue_stale_recovers_orphaned_job(tmp_path, monkeypatch):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.submit({})
+    assert queue._claim("dead-worker")[0] == job_id
+    monkeypatch.setattr(job_queue, "JOB_STALE_SECONDS", -1)
+    assert queue.requeue_stale() == 1
+    assert queue.get(job_id)["status"] == job_queue.QUEUED
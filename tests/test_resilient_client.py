@@ -0,0 +1,131 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+import fake_model
+import resilient_client
+from resilient_client import CircuitBreaker, CircuitOpenError, ResilientModel
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the attempt number of each backoff instead of waiting it out."""
+    recorded = []
+
+    def no_wait(attempt):
+        recorded.append(attempt)
+        return 0.0
+
+    monkeypatch.setattr(resilient_client, "backoff_delay", no_wait)
+    return recorded
+
+
+def test_transient_failures_are_retried_until_success(delays):
+    fake = fake_model.FakeGenerativeModel(fail_first=3, error_code=503)
+    model = ResilientModel(fake, breaker=CircuitBreaker(failure_threshold=10), max_retries=4)
+    response = model.generate_content("Analyze this interview transcript")
+    assert response.text
+    assert fake.calls == 4
+    assert delays == [0, 1, 2]
+
+
+def test_retries_give_up_after_max_retries(delays):
+    fake = fake_model.FakeGenerativeModel(error_rate=1.0, error_code=429)
+    model = ResilientModel(fake, breaker=CircuitBreaker(failure_threshold=10), max_retries=2)
+    with pytest.raises(fake_model.FakeAPIError):
+        model.generate_content("Analyze this interview transcript")
+    assert fake.calls == 3
+
+
+def test_non_transient_errors_are_not_retried(delays):
+    fake = fake_model.FakeGenerativeModel(error_rate=1.0, error_code=400)
+    breaker = CircuitBreaker(failure_threshold=1)
+    model = ResilientModel(fake, breaker=breaker, max_retries=4)
+    with pytest.raises(fake_model.FakeAPIError):
+        model.generate_content("Analyze this interview transcript")
+    assert fake.calls == 1
+    assert delays == []
+    assert breaker.state == "closed"
+
+
+def test_backoff_uses_full_jitter_up_to_a_cap(monkeypatch):
+    monkeypatch.setattr(resilient_client, "random", random.Random(0))
+    for attempt in range(8):
+        samples = [resilient_client.backoff_delay(attempt, base=1.0, cap=10.0) for _ in range(200)]
+        ceiling = min(10.0, 2 ** attempt)
+        assert all(0 <= delay <= ceiling for delay in samples)
+        # Full jitter spreads delays over the whole range rather than clustering at the ceiling
+        assert min(samples) < ceiling * 0.1 and max(samples) > ceiling * 0.9
+
+
+def test_consecutive_failures_open_the_breaker(delays):
+    fake = fake_model.FakeGenerativeModel(error_rate=1.0, error_code=503)
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    model = ResilientModel(fake, breaker=breaker, max_retries=0)
+    for _ in range(3):
+        with pytest.raises(fake_model.FakeAPIError):
+            model.generate_content("Analyze this interview transcript")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        model.generate_content("Analyze this interview transcript")
+    # An open circuit fails fast without calling the model
+    assert fake.calls == 3
+
+
+def test_half_open_probe_success_closes_the_breaker(delays):
+    fake = fake_model.FakeGenerativeModel(fail_first=2, error_code=503)
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    model = ResilientModel(fake, breaker=breaker, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(fake_model.FakeAPIError):
+            model.generate_content("Analyze this interview transcript")
+    assert breaker.state == "open"
+    breaker.opened_at -= 31
+    assert breaker.state == "half-open"
+    assert model.generate_content("Analyze this interview transcript").text
+    assert breaker.state == "closed"
+
+
+def test_concurrent_identical_calls_share_one_request():
+    fake = fake_model.FakeGenerativeModel(latency=0.2)
+    model = ResilientModel(fake)
+    barrier = threading.Barrier(8)
+    responses = []
+
+    def call():
+        barrier.wait()
+        responses.append(model.generate_content("Analyze this interview transcript"))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake.calls == 1
+    assert len({id(response) for response in responses}) == 1
+
+
+def test_concurrent_identical_async_calls_share_one_request():
+    fake = fake_model.FakeGenerativeModel(latency=0.1)
+    model = ResilientModel(fake)
+
+    async def run():
+        return await asyncio.gather(*(model.generate_content_async("Analyze this interview transcript")
+                                      for _ in range(8)))
+
+    responses = asyncio.run(run())
+    assert fake.calls == 1
+    assert len(responses) == 8
+
+
+def test_different_calls_are_not_coalesced():
+    fake = fake_model.FakeGenerativeModel(latency=0.05)
+    model = ResilientModel(fake)
+    threads = [threading.Thread(target=model.generate_content, args=(f"Transcript {n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake.calls == 4
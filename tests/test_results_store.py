@@ -0,0 +1,80 @@
+import threading
+
+import results_store
+
+
+def record(transcript_hash, rating, decision, name=None, jd_hash="jd-1", requisition="Backend Engineer"):
+    return {"requisition": requisition, "jd_hash": jd_hash, "transcript_hash": transcript_hash,
+            "candidate_name": name, "file_name": f"{transcript_hash}.txt", "overall_rating": rating,
+            "decision": decision, "confidence": "High", "bias_review": False,
+            "analysis": f"Rating {rating}/5", "parsed": {"overall_rating": rating}}
+
+
+def test_save_and_get_round_trip(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path / "results.db"))
+    result_id = store.save(record("t-1", 4.5, "SELECT", name="Ann Lee"))
+    result = store.get(result_id)
+    assert result["candidate_name"] == "Ann Lee"
+    assert result["parsed"] == {"overall_rating": 4.5}
+    assert store.get(result_id + 1) is None
+
+
+def test_reanalysis_updates_the_same_row(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path / "results.db"))
+    first = store.save(record("t-1", 2.0, "REJECT", name="Ann Lee"))
+    second = store.save(record("t-1", 4.0, "SELECT"))
+    assert first == second
+    rows = store.rank()
+    assert len(rows) == 1
+    assert rows[0]["overall_rating"] == 4.0
+    # A re-analysis that could not find the name keeps the one stored earlier
+    assert rows[0]["candidate_name"] == "Ann Lee"
+
+
+def test_rank_orders_and_filters(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path / "results.db"))
+    store.save(record("t-1", 3.0, "HOLD", name="Ann Lee"))
+    store.save(record("t-2", 4.5, "SELECT", name="Bo Chen"))
+    store.save(record("t-3", 1.5, "REJECT", name="Cy Diaz"))
+    store.save(record("t-4", 5.0, "SELECT", name="Di Evans", jd_hash="jd-2", requisition="Data Engineer"))
+
+    assert [row["candidate_name"] for row in store.rank(jd_hash="jd-1")] == ["Bo Chen", "Ann Lee", "Cy Diaz"]
+    assert [row["candidate_name"] for row in store.rank(jd_hash="jd-1", decisions=["SELECT", "HOLD"])] \
+        == ["Bo Chen", "Ann Lee"]
+    assert store.rank(jd_hash="jd-1", decisions=[]) == []
+    assert [row["candidate_name"] for row in store.rank(min_rating=4)] == ["Di Evans", "Bo Chen"]
+    assert [row["candidate_name"] for row in store.rank(search="chen")] == ["Bo Chen"]
+    assert [row["candidate_name"] for row in store.rank(jd_hash="jd-1", order="name")] \
+        == ["Ann Lee", "Bo Chen", "Cy Diaz"]
+
+
+def test_requisitions_count_decisions(tmp_path):
+    store = results_store.ResultsStore(str(tmp_path / "results.db"))
+    store.save(record("t-1", 3.0, "HOLD"))
+    store.save(record("t-2", 4.5, "SELECT"))
+    store.save(record("t-3", 1.5, "REJECT"))
+    [summary] = store.requisitions()
+    assert (summary["candidates"], summary["selected"], summary["held"], summary["rejected"]) == (3, 1, 1, 1)
+    assert summary["best_rating"] == 4.5
+
+
+def test_concurrent_saves_from_threads(tmp_path):
+    store = results_store.get_store(str(tmp_path / "results.db"))
+    threads = [threading.Thread(target=store.save, args=(record(f"t-{n}", n % 5 + 1, "HOLD"),)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.rank()) == 20
+    assert results_store.get_store(str(tmp_path / "results.db")) is store
+
+
+def test_save_result_stores_the_fallback_decision(tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "RESULTS_DB_PATH", str(tmp_path / "results.db"))
+    analysis = "**1. Interview Overview**\nCandidate Name: Ann Lee\n\n**7. Overall Assessment**\nOverall Rating: 4.5/5"
+    parsed = app.parse_analysis(analysis, app.get_decision_levels())
+    assert parsed["decision"] is None
+    result_id = app.save_result({"analysis": analysis, "parsed": parsed}, "transcript", "job description")
+    assert app.get_results_store().get(result_id)["decision"] == "SELECT"
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import transcript_compaction
+from transcript_compaction import compact_transcript
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "transcripts")
+
+with open(os.path.join(FIXTURE_DIR, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+
+@pytest.mark.parametrize("file_name", sorted(EXPECTED))
+def test_fixture_fidelity(file_name):
+    with open(os.path.join(FIXTURE_DIR, file_name), encoding="utf-8") as f:
+        compacted, _ = compact_transcript(f.read())
+    expected = EXPECTED[file_name]
+    assert [phrase for phrase in expected["must_contain"] if phrase not in compacted] == []
+    assert [phrase for phrase in expected["must_not_contain"] if phrase in compacted] == []
+    for phrase, limit in expected.get("max_count", {}).items():
+        assert compacted.count(phrase) <= limit, phrase
+
+
+@pytest.mark.parametrize("line", [
+    "Candidate: I sync weekly with the HM and the ER team.",
+    "Interviewer: What did you do at UM?",
+    "Candidate: AH and HMM are the codes we used.",
+])
+def test_all_caps_acronyms_are_not_fillers(line):
+    compacted, stats = compact_transcript(line)
+    assert compacted == line
+    assert stats["fillers"] == 0
+
+
+def test_lowercase_and_sentence_case_fillers_are_removed():
+    compacted, stats = compact_transcript("Candidate: Um, I moved the, uh, jobs to Airflow.")
+    assert compacted.startswith("Candidate: I moved the jobs to Airflow.")
+    assert stats["fillers"] == 2
+
+
+def test_plain_transcript_keeps_lines_that_start_like_the_previous_one():
+    text = ("Candidate: First, we measured latency. Then we halved it.\n"
+            "Candidate: First, we measured latency.")
+    compacted, stats = compact_transcript(text)
+    assert compacted.count("First, we measured latency.") == 2
+    assert stats["duplicate_lines"] == 0
+
+
+def test_plain_transcript_drops_exact_repeats():
+    compacted, stats = compact_transcript("Candidate: We used Kafka.\nCandidate: We used Kafka.")
+    assert compacted == "Candidate: We used Kafka."
+    assert stats["duplicate_lines"] == 1
+
+
+def test_rolling_captions_keep_the_longest_line():
+    text = ("WEBVTT\n\n00:00:01.000 --> 00:00:02.000\n<v Sam>I started as a backend</v>\n\n"
+            "00:00:02.000 --> 00:00:04.000\n<v Sam>I started as a backend engineer in 2017.</v>\n")
+    compacted, _ = compact_transcript(text)
+    assert compacted == "Sam: I started as a backend engineer in 2017."
+
+
+def test_no_steps_returns_the_text_unchanged():
+    text = "WEBVTT\n\n1\n00:00:01.000 --> 00:00:02.000\nUm, hello"
+    assert compact_transcript(text, ())[0] == text
+
+
+def test_parse_steps():
+    assert transcript_compaction.parse_steps("all") == transcript_compaction.COMPACTION_STEPS
+    assert transcript_compaction.parse_steps("off") == ()
+    assert transcript_compaction.parse_steps("fillers, timestamps") == ("timestamps", "fillers")
+    with pytest.raises(ValueError):
+        transcript_compaction.parse_steps("timestamps,emoji")
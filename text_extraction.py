@@ -0,0 +1,110 @@
+"""Text extraction for uploaded PDF, DOCX and plain-text files.
+
+Kept in its own module (rather than in app.py) so the process pool used for
+large PDFs can import the worker function by name.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_MIME_TYPE = 'application/pdf'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# PDFs with at least this many pages are split into page ranges across worker processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "20"))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool():
+    """Return the process-wide extraction pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn avoids forking the (multi-threaded) Streamlit server process
+            _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_pdf_page_range(data, start, stop):
+    """Extract the text of pages [start, stop) of a PDF; runs in a worker process."""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [page.extract_text() or '' for page in reader.pages[start:stop]]
+
+
+def extract_pdf_text(data):
+    """Extract the text of every page exactly once, in parallel for large PDFs."""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+
+    if page_count < PDF_PARALLEL_MIN_PAGES or EXTRACTION_WORKERS < 2:
+        page_texts = [page.extract_text() or '' for page in reader.pages]
+    else:
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                  for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+        pool = _get_process_pool()
+        futures = [pool.submit(_extract_pdf_page_range, data, start, stop) for start, stop in ranges]
+        page_texts = [text for future in futures for text in future.result()]
+
+    return '\n'.join(text for text in page_texts if text)
+
+
+def _table_text(table):
+    """Flatten a table into one line per row, cells separated by ' | '."""
+    lines = []
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            # Merged cells are returned once per grid position; keep one copy
+            if cells and cells[-1][0] is cell._tc:
+                continue
+            cells.append((cell._tc, _block_text(cell)))
+        line = ' | '.join(text for _, text in cells if text)
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def _block_text(container):
+    """Text of the paragraphs and tables in a document, cell or header, in document order."""
+    from docx.table import Table
+    parts = []
+    for block in container.iter_inner_content():
+        text = _table_text(block) if isinstance(block, Table) else block.text
+        if text.strip():
+            parts.append(text)
+    return '\n'.join(parts)
+
+
+def extract_docx_text(data):
+    """Extract headers, body paragraphs and tables from a DOCX file."""
+    from docx import Document
+    doc = Document(io.BytesIO(data))
+
+    headers = []
+    for section in doc.sections:
+        if section.header.is_linked_to_previous:
+            continue
+        text = _block_text(section.header)
+        if text and text not in headers:
+            headers.append(text)
+
+    body = _block_text(doc)
+    return '\n'.join(headers + [body]) if body else '\n'.join(headers)
+
+
+def extract_text(data, file_type):
+    """Extract text from raw file bytes based on the MIME type; plain text is decoded as UTF-8."""
+    if file_type == PDF_MIME_TYPE:
+        return extract_pdf_text(data)
+    if file_type == DOCX_MIME_TYPE:
+        return extract_docx_text(data)
+    return data.decode('utf-8')
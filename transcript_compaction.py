@@ -0,0 +1,211 @@
+"""Transcript compaction: strip what costs prompt tokens but carries no interview content.
+
+Meeting and caption exports are full of timestamps, caption cue numbers,
+"recording started" banners, filler words, a speaker label on every caption
+line and rolling captions that repeat the previous line. compact_transcript
+removes those while keeping every spoken sentence, speaker and question the
+8-section report is built from. Each step can be switched off.
+"""
+import re
+
+# All steps, in the order they are applied
+COMPACTION_STEPS = ("boilerplate", "timestamps", "captions", "speakers", "fillers", "duplicates", "whitespace")
+
+# Caption file structure, only looked for when the input is WEBVTT or SRT
+CAPTION_HEADER = re.compile(r'^(?:WEBVTT\b.*|NOTE(?:\s.*)?|(?:Kind|Language):.*|X-TIMESTAMP-MAP=.*)$')
+CAPTION_TIMING = re.compile(r'^(?:\d{2}:)?\d{2}:\d{2}[.,]\d{3} --> ')
+CUE_NUMBER = re.compile(r'^\d+$')
+SRT_CUE = re.compile(r'^\d+\r?\n(?:\d{2}:)?\d{2}:\d{2}[.,]\d{3} --> ', re.MULTILINE)
+
+# Lines that are nothing but a recording notice, export banner, page number or separator
+BOILERPLATE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^(?:this|the) (?:meeting|call|session|conversation) (?:is|was|will be) (?:being )?recorded'
+    r'(?: and transcribed)?[.!]?$',
+    r'^(?:recording|transcription) (?:started|stopped|in progress|has started|has stopped)'
+    r'(?:\s*[:-]?\s*[\d/:.,]+(?:\s*[ap]m)?)?[.!]?$',
+    r'^(?:this )?transcri(?:pt|ption) (?:was )?(?:generated|created|produced|provided) (?:by|with|using) [\w.:/ -]+$',
+    r'^(?:powered by|transcribed by|generated by) [\w.:/ -]+$|^otter\.ai$',
+    r'^page \d+(?: of \d+)?$',
+    r'^-{3,}$|^={3,}$|^_{3,}$',
+)]
+
+# [00:12], (00:12:34), 00:12:34.567 and similar, at the start of a line or in brackets anywhere
+LEADING_TIMESTAMP = re.compile(r'^[\[(]?\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d{1,3})?[\])]?(?:\s*[-|]\s*|\s+|$)')
+BRACKETED_TIMESTAMP = re.compile(r'\s*[\[(]\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d{1,3})?[\])]\s*')
+# "John Smith  03:12" header lines (Otter and similar exports) put the speaker above the text
+SPEAKER_HEADER = re.compile(r"^([A-Z][\w'.-]*(?: [A-Z][\w'.-]*){0,3})\s+[\[(]?\d{1,2}:\d{2}(?::\d{2})?[\])]?$")
+
+# Caption markup and sound annotations; [inaudible] and [crosstalk] are kept since they mark missing content
+VOICE_TAG = re.compile(r'^<v(?:\.[\w.]+)?\s+([^>]+)>(.*?)(?:</v>)?$')
+CAPTION_TAGS = re.compile(r'</?(?:c|i|b|u|v|lang)(?:[.\s][^>]*)?>|<\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?>')
+SOUND_ANNOTATIONS = re.compile(r'\s*[\[(](?:music|applause|laughter|laughs|silence|noise|background noise|'
+                               r'coughs?|pause|no audio)[\])]\s*|♪+', re.IGNORECASE)
+
+SPEAKER_LABEL = re.compile(r"^(?:>>\s*|-\s+)?([A-Za-z][\w'.-]*(?: [A-Za-z][\w'().-]*){0,3})\s*:\s+(.*)$")
+# "Candidate:" alone on a line hands the turn to that speaker
+BARE_SPEAKER_LABEL = re.compile(r"^(?:>>\s*|-\s+)?([A-Z][\w'.-]*(?: [A-Z][\w'().-]*){0,3})\s*:$")
+
+# Lowercase or sentence-case only: ALL-CAPS tokens are acronyms ("HM", "ER", "UM"), not fillers
+FILLER_WORDS = (r"(?<![\w'-])(?:[Uu]u*h*m+|[Uu]u*h+|[Ee]e*r+m+|[Ee]e*r+|[Aa]a*h+|[Hh]h*m+|[Mm]m*h*m+)"
+                r"(?![\w'-])")
+# ", um, " inside a sentence, "Um, " opening one, and any other filler, tried in that order
+FILLER_PATTERNS = (
+    (re.compile(rf",\s*{FILLER_WORDS},(?=\s)"), ""),
+    (re.compile(rf"(^|[.?!]\s+){FILLER_WORDS}(?:,|\.{{1,3}}|…)?\s*(\w)"),
+     lambda match: match.group(1) + match.group(2).upper()),
+    (re.compile(rf"{FILLER_WORDS}(?:,|\.{{1,3}}|…)?\s*"), ""),
+)
+
+
+def parse_steps(setting):
+    """Turn a setting like "all", "none" or "timestamps,fillers" into a tuple of step names."""
+    setting = (setting or "").strip().lower()
+    if setting in ("", "all", "on", "1", "true", "yes"):
+        return COMPACTION_STEPS
+    if setting in ("none", "off", "0", "false", "no"):
+        return ()
+    requested = {step.strip() for step in setting.split(',')}
+    unknown = requested - set(COMPACTION_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown compaction step(s): {', '.join(sorted(unknown))}. "
+                         f"Available: {', '.join(COMPACTION_STEPS)}.")
+    return tuple(step for step in COMPACTION_STEPS if step in requested)
+
+
+def _normalize_speaker(label, aliases):
+    """Return one spelling per speaker: collapse spaces, title-case ALL-CAPS labels, reuse the first form seen."""
+    label = re.sub(r'\s+', ' ', label).strip()
+    if label.isupper() and len(label) > 2:
+        label = label.title()
+    return aliases.setdefault(label.lower(), label)
+
+
+def compact_transcript(text, steps=COMPACTION_STEPS):
+    """Return (compacted_text, stats) with the given steps applied.
+
+    stats counts what each step removed, plus characters and lines before and after.
+    """
+    steps = set(steps)
+    stats = {"chars_before": len(text), "lines_before": text.count('\n') + 1, "boilerplate_lines": 0,
+             "timestamps": 0, "caption_artifacts": 0, "speaker_labels_merged": 0, "fillers": 0,
+             "duplicate_lines": 0}
+    if not steps:
+        stats.update(chars_after=len(text), lines_after=stats["lines_before"])
+        return text, stats
+
+    text = text.replace('\r\n', '\n').replace('\r', '\n').lstrip('\ufeff')
+    is_captions = text.startswith('WEBVTT') or bool(SRT_CUE.search(text))
+    raw_lines = text.split('\n')
+    aliases = {}
+    turns = []  # [speaker or None, [fragments]]
+    current_speaker = None
+    for index, raw_line in enumerate(raw_lines):
+        line = raw_line.strip()
+        if "whitespace" in steps:
+            line = re.sub(r'[ \t\u00a0]+', ' ', line)
+        if not line:
+            if "whitespace" not in steps:
+                turns.append([None, [""]])
+            continue
+
+        if "boilerplate" in steps and is_captions:
+            # A number is a cue identifier only when the cue's timing line follows it
+            next_line = raw_lines[index + 1].strip() if index + 1 < len(raw_lines) else ""
+            if CAPTION_HEADER.match(line) or CAPTION_TIMING.match(line) \
+                    or (CUE_NUMBER.match(line) and CAPTION_TIMING.match(next_line)):
+                stats["boilerplate_lines"] += 1
+                continue
+
+        speaker = None
+        if "captions" in steps:
+            voice = VOICE_TAG.match(line)
+            if voice:
+                speaker, line = voice.group(1), voice.group(2)
+            cleaned = SOUND_ANNOTATIONS.sub(' ', CAPTION_TAGS.sub('', line)).strip()
+            if cleaned != line:
+                stats["caption_artifacts"] += 1
+                line = cleaned
+            if not line:
+                continue
+
+        if "timestamps" in steps:
+            header = SPEAKER_HEADER.match(line)
+            if header:
+                current_speaker = header.group(1)
+                stats["timestamps"] += 1
+                continue
+            stripped = BRACKETED_TIMESTAMP.sub(' ', LEADING_TIMESTAMP.sub('', line, count=1)).strip()
+            if stripped != line:
+                stats["timestamps"] += 1
+                line = stripped
+            if not line:
+                continue
+
+        if speaker is None:
+            bare = BARE_SPEAKER_LABEL.match(line)
+            if bare:
+                current_speaker = bare.group(1)
+                continue
+            label = SPEAKER_LABEL.match(line)
+            if label:
+                speaker, line = label.group(1), label.group(2).strip()
+        # Unlabelled lines belong to whoever spoke last
+        current_speaker = speaker = speaker or current_speaker
+
+        if "boilerplate" in steps and any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS):
+            stats["boilerplate_lines"] += 1
+            continue
+        if "speakers" in steps and speaker:
+            speaker = _normalize_speaker(speaker, aliases)
+
+        if "fillers" in steps:
+            for pattern, replacement in FILLER_PATTERNS:
+                line, removed = pattern.subn(replacement, line)
+                stats["fillers"] += removed
+            line = re.sub(r'\s+([,.?!])', r'\1', line).strip()
+            if not line or not re.search(r'\w', line):
+                continue
+
+        previous = turns[-1] if turns else None
+        if "speakers" in steps and previous and previous[0] is not None and speaker in (None, previous[0]):
+            # Continuation of the previous speaker's turn: drop the repeated label
+            if speaker is not None:
+                stats["speaker_labels_merged"] += 1
+            if "duplicates" in steps and _is_repeat(previous[1][-1], line, is_captions):
+                stats["duplicate_lines"] += 1
+                if len(line) > len(previous[1][-1]):
+                    # Rolling captions: the new line extends the previous one
+                    previous[1][-1] = line
+                continue
+            previous[1].append(line)
+            continue
+
+        if "duplicates" in steps and previous and previous[0] == speaker and previous[1] != [""] \
+                and _is_repeat(previous[1][-1], line, is_captions):
+            stats["duplicate_lines"] += 1
+            if len(line) > len(previous[1][-1]):
+                previous[1][-1] = line
+            continue
+        turns.append([speaker, [line]])
+
+    lines = []
+    for speaker, fragments in turns:
+        body = ' '.join(fragments) if "speakers" in steps else '\n'.join(fragments)
+        lines.append(f"{speaker}: {body}" if speaker else body)
+    compacted = '\n'.join(lines).strip()
+    if stats["fillers"]:
+        # Fluency still matters for the communication section, so say what was removed
+        compacted += f"\n[Note: {stats['fillers']} filler words (um, uh, er) were removed before analysis.]"
+    stats.update(chars_after=len(compacted), lines_after=compacted.count('\n') + 1)
+    return compacted, stats
+
+
+def _is_repeat(previous, line, is_captions=False):
+    """True if line repeats previous; in caption files also if one is a prefix of the other (rolling captions).
+
+    In other transcripts a line that merely starts like the previous one is a new sentence, not a repeat.
+    """
+    previous, line = previous.lower().rstrip(' .,'), line.lower().rstrip(' .,')
+    if line == previous:
+        return True
+    return is_captions and len(previous) > 10 and (line.startswith(previous) or previous.startswith(line))